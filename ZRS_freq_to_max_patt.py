@@ -2,7 +2,8 @@
 
 
 ### This script takes the frequent patterns mined for the ZRS data and keeps
-### only the closed patterns.
+### only the maximal patterns. Running mine_ZRS_frequent_patterns.py without the
+### freq keyword mines these directly.
 
 if __name__ == '__main__':
 
@@ -32,7 +33,7 @@ if __name__ == '__main__':
             max_patterns += [curr_pattern]
     f.close()
 
-    # Write out the closed patterns.
+    # Write out the maximal patterns.
     f = open('./results/ZRS_freq_patterns.txt', 'r')
     out = open('./results/ZRS_max_patterns.txt', 'w')
     for line in f:
@@ -2,6 +2,7 @@
 ### Author: Edward Huang
 
 from collections import OrderedDict
+import zrs_vocabulary
 
 ### This script takes in each of the three spreadsheets for traditional Chinese
 ### medicine, and creates files ready to be used by LDA-C.
@@ -9,36 +10,33 @@ from collections import OrderedDict
 ### num_unique_terms term_1_index:count term_2_index:count... term_N_index:count
 
 if __name__ == '__main__':
+    vocabulary, term_to_id = zrs_vocabulary.read_vocabulary()
+    transactions = zrs_vocabulary.read_transactions()
+
     for file_type in ['drugs', 'symptoms']:
-        document_dct = OrderedDict({})
+        # LDA-C expects term indices in [0, V) for each vocabulary, so map the
+        # shared ids seen in the current file to consecutive indices.
         target_vocab = []
-        # Read in the target file.
-        f = open('./data/norm_ZRS_patient_%s.txt' % file_type, 'r')
-        for i, line in enumerate(f):
-            # Skip header for drug file.
-            if file_type == 'drugs' and i == 0:
-                continue
-            # Each document is considered as a visit to the doctor. The terms are
-            # the targets, whether it is the set of herbs issued, or the symptoms
-            # identified.
-            line = line.split()
-            visit_no = line[0]
-            targets = line[1:]
-            # Add to our vocabulary the current target.
+        target_index_dct = {}
+        document_dct = OrderedDict({})
+        for visit_no, symptoms, drugs in transactions:
+            # Each document is considered as a visit to the doctor. The terms
+            # are the targets, whether it is the set of herbs issued, or the
+            # symptoms identified.
+            targets = drugs if file_type == 'drugs' else symptoms
             for target in targets:
-                if target not in target_vocab:
+                # Add to our vocabulary the current target.
+                if target not in target_index_dct:
+                    target_index_dct[target] = len(target_vocab)
                     target_vocab += [target]
 
                 # Keep track of the counts for each term within each document.
-                if visit_no in document_dct:
-                    if target in document_dct[visit_no]:
-                        document_dct[visit_no][target] += 1
-                    else:
-                        document_dct[visit_no][target] = 1
-                else:
+                if visit_no not in document_dct:
                     document_dct[visit_no] = OrderedDict({})
+                if target in document_dct[visit_no]:
+                    document_dct[visit_no][target] += 1
+                else:
                     document_dct[visit_no][target] = 1
-        f.close()
 
         # Write out the input file for LDA.
         out = open('./data/ZRS_lda_input_%s.txt' % file_type, 'w')
@@ -49,11 +47,12 @@ if __name__ == '__main__':
 
             for target in document_dct[visit_no]:
                 target_count = str(document_dct[visit_no][target])
-                out.write(str(target_vocab.index(target)) + ':' + target_count + ' ')
+                out.write(str(target_index_dct[target]) + ':' + target_count +
+                    ' ')
             out.write('\n')
         out.close()
 
         vocab_f = open('./data/ZRS_%s_vocab.txt' % file_type, 'w')
         for target in target_vocab:
-            vocab_f.write('%s\n' % target)
-        vocab_f.close()
\ No newline at end of file
+            vocab_f.write('%s\n' % vocabulary[target][0])
+        vocab_f.close()
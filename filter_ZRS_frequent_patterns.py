@@ -1,40 +1,13 @@
 
 
 import time
+import zrs_vocabulary
 
 if __name__ == '__main__':
     start_time = time.time()
 
-    # Dictionary, with keys as patient ids, as values as lists of symptoms.
-    symptom_dct = {}
-    # Read in the symptoms file.
-    f = open('./data/ZRS_patient_symptoms.txt', 'r')
-    for line in f:
-        line = line.split()
-        visit_no = line[0]
-        symptoms = line[1:]
-        for symptom in symptoms:
-            if symptom in symptom_dct:
-                symptom_dct[symptom] += 1
-            else:
-                symptom_dct[symptom] = 1
-    f.close()
-
-    drug_dct = {}
-    f = open('./data/ZRS_patient_drugs.txt', 'r')
-    for i, line in enumerate(f):
-        # Skip the header.
-        if i == 0:
-            continue
-        line = line.split()
-        visit_no = line[0]
-        drugs = line[1:]
-        for drug in drugs:
-            if drug in drug_dct:
-                drug_dct[drug] += 1
-            else:
-                drug_dct[drug] = 1
-    f.close()
+    # Used to tell the drugs apart from the symptoms.
+    vocabulary, term_to_id = zrs_vocabulary.read_vocabulary()
 
     f = open('./results/ZRS_freq_patterns.txt', 'r')
     out = open('./results/norm_ZRS_freq_patterns.txt', 'w')
@@ -46,10 +19,11 @@ if __name__ == '__main__':
         drug_patterns = []
         symptom_patterns = []
         for entity in patterns:
-            if entity in drug_dct:
+            term_type = vocabulary[term_to_id[entity]][1]
+            if term_type == 'drug':
                 drug_patterns += [entity]
             else:
-                assert (entity in symptom_dct)
+                assert term_type == 'symptom'
                 symptom_patterns += [entity]
         out.write(', '.join(drug_patterns))
         out.write(' -> ')
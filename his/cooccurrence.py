@@ -0,0 +1,329 @@
+### Author: Edward Huang
+
+import numpy as np
+import os
+from scipy import sparse
+
+### This module counts item co-occurrences with sparse matrices. The visits
+### form a binary visit by item incidence matrix X, so that X^T X holds the
+### number of visits that every pair of items shares, with the item counts on
+### its diagonal. Similarity scores are then computed over the nonzero pairs as
+### numpy arrays instead of one pair at a time.
+
+def build_incidence(baskets, num_items):
+    '''
+    Returns the binary visit by item CSR matrix of a list of baskets, where
+    each basket is a list of item ids. Repeated items count once.
+    '''
+    indptr = np.zeros(len(baskets) + 1, dtype=np.int64)
+    indices = []
+    for i, basket in enumerate(baskets):
+        basket = sorted(set(basket))
+        indices += basket
+        indptr[i + 1] = indptr[i] + len(basket)
+    indices = np.array(indices, dtype=np.int32)
+    return sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), indices,
+        indptr), shape=(len(baskets), num_items))
+
+def count_pairs(incidence):
+    '''
+    Returns the (item a, item b, count) arrays of every pair of items that
+    appear together in at least one visit, with a < b.
+    '''
+    counts = (incidence.T.tocsr() * incidence).tocoo()
+    upper = counts.row < counts.col
+    return counts.row[upper], counts.col[upper], counts.data[upper]
+
+def get_item_counts(incidence):
+    return np.asarray(incidence.sum(axis=0)).ravel()
+
+# Pointwise mutual information.
+def pmi(c_12, c_1, c_2, N):
+    # N is the number of bigram herb-symptom pairs.
+    # c_12 is C(w_1, w_2), c_1 = C(w_1), c_2 = C(w_2). Pairs that never
+    # co-occur get -inf.
+    c_12, c_1, c_2 = [np.asarray(c, dtype=np.float64) for c in (c_12, c_1,
+        c_2)]
+    with np.errstate(divide='ignore'):
+        return np.log2(c_12) + np.log2(N) - np.log2(c_1) - np.log2(c_2)
+
+def mutual_information(N_AB, N_A, N_B, N):
+    '''
+    Mutual information between the presence of A and of B in a visit, over the
+    four combinations. Counts are smoothed by adding 0.25 to each cell.
+    '''
+    N_AB, N_A, N_B = [np.asarray(c, dtype=np.float64) for c in (N_AB, N_A,
+        N_B)]
+    # p(A=1, B=1)
+    p_11 = (N_AB + 0.25) / (N + 1)
+    p_A1 = (N_A + 0.5) / (N + 1)
+    p_B1 = (N_B + 0.5) / (N + 1)
+    sim_score = p_11 * np.log2(p_11 / p_A1 / p_B1)
+    # p(A=1, B=0)
+    p_10 = (N_A - N_AB + 0.25) / (N + 1)
+    p_B0 = 1 - p_B1
+    sim_score += p_10 * np.log2(p_10 / p_A1 / p_B0)
+    # p(A=0, B=1)
+    p_01 = (N_B - N_AB + 0.25) / (N + 1)
+    p_A0 = 1 - p_A1
+    sim_score += p_01 * np.log2(p_01 / p_A0 / p_B1)
+    # p(A=0, B=0)
+    p_00 = (N - N_A - N_B + N_AB + 0.25) / (N + 1)
+    sim_score += p_00 * np.log2(p_00 / p_A0 / p_B0)
+    return sim_score
+
+# Measures computed by get_association_measures.
+ASSOCIATION_MEASURES = ['mi', 'npmi', 'lift', 'chi2', 'g2', 'jaccard']
+
+def get_association_measures(N_AB, N_A, N_B, N, measures=ASSOCIATION_MEASURES):
+    '''
+    Returns a dictionary from each measure name to its scores, computed from
+    the 2x2 contingency table of every pair: N_AB visits with both items, N_A
+    and N_B visits with each item, out of N visits.
+    '''
+    N_AB, N_A, N_B = [np.asarray(c, dtype=np.float64) for c in (N_AB, N_A,
+        N_B)]
+    N = float(N)
+    # Observed and expected counts of the four cells, as (observed, expected).
+    cells = [(N_AB, N_A * N_B / N), (N_A - N_AB, N_A * (N - N_B) / N),
+        (N_B - N_AB, (N - N_A) * N_B / N),
+        (N - N_A - N_B + N_AB, (N - N_A) * (N - N_B) / N)]
+    score_dct = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if 'mi' in measures:
+            score_dct['mi'] = mutual_information(N_AB, N_A, N_B, N)
+        if 'npmi' in measures:
+            # PMI normalized by -log p(A, B), which is 1 when A and B always
+            # appear together.
+            p_AB = N_AB / N
+            npmi = np.log(p_AB * N * N / N_A / N_B) / -np.log(p_AB)
+            npmi[p_AB == 1] = 1
+            npmi[N_AB == 0] = -1
+            score_dct['npmi'] = npmi
+        if 'lift' in measures:
+            score_dct['lift'] = N_AB * N / N_A / N_B
+        if 'chi2' in measures:
+            chi2 = N * (cells[0][0] * cells[3][0] - cells[1][0] * cells[2][0]
+                ) ** 2 / (N_A * N_B * (N - N_A) * (N - N_B))
+            # Items in every visit have no variance.
+            chi2[~np.isfinite(chi2)] = 0
+            score_dct['chi2'] = chi2
+        if 'g2' in measures:
+            g2 = np.zeros(len(N_AB))
+            for observed, expected in cells:
+                # Empty cells contribute nothing.
+                g2 += np.where(observed > 0, observed * np.log(observed /
+                    expected), 0)
+            score_dct['g2'] = 2 * g2
+        if 'jaccard' in measures:
+            score_dct['jaccard'] = N_AB / (N_A + N_B - N_AB)
+    return score_dct
+
+def get_top_pairs(items, scores, k):
+    '''
+    Groups pairs by item, and returns a dictionary from each item to the
+    indices of its k best scoring pairs, best first. The k best are selected
+    with argpartition before they are sorted.
+    '''
+    if len(items) == 0:
+        return {}
+    order = np.argsort(items, kind='mergesort')
+    sorted_items = items[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_items[1:] !=
+        sorted_items[:-1])))
+    ends = np.concatenate((starts[1:], [len(items)]))
+    top_dct = {}
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        item_pairs = order[start:end]
+        item_scores = scores[item_pairs]
+        if end - start > k:
+            top = np.argpartition(-item_scores, k - 1)[:k]
+        else:
+            top = np.arange(end - start)
+        top = top[np.argsort(-item_scores[top], kind='mergesort')]
+        top_dct[int(sorted_items[start])] = item_pairs[top]
+    return top_dct
+
+### For corpora whose pairs do not fit in memory, visits are counted in chunks.
+### Each chunk's pair counts are spilled to disk as a run sorted by pair key,
+### and the runs are merged MERGE_FAN_IN at a time, summing the counts of equal
+### keys, until one run is left. A run is a pair of flat binary files of keys
+### and int64 values, read back with memory maps. Memory use is bounded by the
+### given budget in bytes instead of the number of distinct pairs.
+
+# Number of runs merged at a time.
+MERGE_FAN_IN = 16
+# Bytes of a run entry, its key and value.
+ENTRY_BYTES = 16
+# Rough bytes used per entry of a chunk's X^T X product, counting the sparse
+# product, its conversion to pairs, and the sort of their keys.
+PRODUCT_BYTES = 64
+
+def get_pair_keys(item_a, item_b):
+    # Pairs of item ids are packed into one int64 key, sorted by a then b.
+    return (np.asarray(item_a, dtype=np.int64) << 32) | np.asarray(item_b,
+        dtype=np.int64)
+
+def split_pair_keys(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    return keys >> 32, keys & 0xffffffff
+
+def get_block_size(memory_budget):
+    '''
+    Number of entries to read from each run at a time, so that a merge of
+    MERGE_FAN_IN runs stays within the memory budget, with room for the
+    concatenation and sort of the blocks.
+    '''
+    return max(1, memory_budget / (MERGE_FAN_IN * ENTRY_BYTES * 4))
+
+def _reduce_sorted(keys, values):
+    # Sums the values of equal keys in a sorted block.
+    if len(keys) == 0:
+        return keys, values
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.add.reduceat(values, starts)
+
+class RunWriter(object):
+    '''
+    Appends sorted blocks of (key, value) entries to a run on disk. If reduce
+    is True, the values of equal keys are summed, also across blocks.
+    '''
+    def __init__(self, fname, key_dtype=np.int64, reduce=False):
+        self.fname = fname
+        self.key_dtype = key_dtype
+        self.reduce = reduce
+        self.key_file = open(fname + '_keys.bin', 'wb')
+        self.value_file = open(fname + '_values.bin', 'wb')
+        # The last entry is held back, since the next block may continue it.
+        self.pending = None
+
+    def write(self, keys, values):
+        keys = np.asarray(keys, dtype=self.key_dtype)
+        values = np.array(values, dtype=np.int64)
+        if not self.reduce:
+            keys.tofile(self.key_file)
+            values.tofile(self.value_file)
+            return
+        keys, values = _reduce_sorted(keys, values)
+        if len(keys) == 0:
+            return
+        if self.pending is not None:
+            if self.pending[0] == keys[0]:
+                values[0] += self.pending[1]
+            else:
+                self._write_pending()
+        self.pending = (keys[-1], values[-1])
+        keys[:-1].tofile(self.key_file)
+        values[:-1].tofile(self.value_file)
+
+    def _write_pending(self):
+        np.array([self.pending[0]], dtype=self.key_dtype).tofile(self.key_file)
+        np.array([self.pending[1]], dtype=np.int64).tofile(self.value_file)
+
+    def close(self):
+        if self.pending is not None:
+            self._write_pending()
+            self.pending = None
+        self.key_file.close()
+        self.value_file.close()
+
+def read_run(fname, key_dtype=np.int64):
+    '''
+    Returns the keys and values of a run as read-only memory maps.
+    '''
+    arrays = []
+    for suffix, dtype in [('_keys.bin', key_dtype), ('_values.bin', np.int64)]:
+        if os.path.getsize(fname + suffix) == 0:
+            # Empty files cannot be memory mapped.
+            arrays += [np.zeros(0, dtype=dtype)]
+        else:
+            arrays += [np.memmap(fname + suffix, dtype=dtype, mode='r')]
+    return tuple(arrays)
+
+def merge_runs(fnames, out_fname, block_size, key_dtype=np.int64,
+    reduce=False):
+    '''
+    Merges sorted runs into one, reading block_size entries of each run at a
+    time. Every step writes out the entries up to the smallest last key of the
+    current blocks, which no later entry can precede. Ties keep run order.
+    '''
+    runs = [read_run(fname, key_dtype) for fname in fnames]
+    positions = [0] * len(runs)
+    writer = RunWriter(out_fname, key_dtype, reduce)
+    while True:
+        blocks = []
+        for i, (keys, values) in enumerate(runs):
+            if positions[i] < len(keys):
+                blocks += [(i, np.array(keys[positions[i]:positions[i] +
+                    block_size]))]
+        if blocks == []:
+            break
+        bound = min(block_keys[-1] for i, block_keys in blocks)
+        merged_keys, merged_values = [], []
+        for i, block_keys in blocks:
+            end = np.searchsorted(block_keys, bound, side='right')
+            merged_keys += [block_keys[:end]]
+            merged_values += [np.array(runs[i][1][positions[i]:positions[i] +
+                end])]
+            positions[i] += end
+        merged_keys = np.concatenate(merged_keys)
+        order = np.argsort(merged_keys, kind='mergesort')
+        writer.write(merged_keys[order], np.concatenate(merged_values)[order])
+    writer.close()
+
+def merge_all_runs(fnames, out_prefix, memory_budget, key_dtype=np.int64,
+    reduce=False):
+    '''
+    Merges runs MERGE_FAN_IN at a time until one is left, and returns its name.
+    Merged runs are named after out_prefix, which must differ between merges
+    that share a directory.
+    '''
+    block_size = get_block_size(memory_budget)
+    level = 0
+    while len(fnames) != 1:
+        merged_fnames = []
+        for start in range(0, max(len(fnames), 1), MERGE_FAN_IN):
+            out_fname = '%s_merge_%d_%d' % (out_prefix, level,
+                len(merged_fnames))
+            merge_runs(fnames[start:start + MERGE_FAN_IN], out_fname,
+                block_size, key_dtype, reduce)
+            merged_fnames += [out_fname]
+        fnames = merged_fnames
+        level += 1
+    return fnames[0]
+
+def count_pairs_chunked(baskets, memory_budget, tmp_dir):
+    '''
+    Counts the pairs of items in an iterable of baskets, a chunk of baskets at
+    a time. A chunk is spilled to a run once its product would exceed the
+    memory budget. Returns the name of the merged run, whose keys are the
+    sorted pair keys and whose values are the pair counts.
+    '''
+    fnames = []
+    def spill(chunk):
+        num_items = max(max(basket) for basket in chunk) + 1
+        item_a, item_b, counts = count_pairs(build_incidence(chunk,
+            num_items))
+        keys = get_pair_keys(item_a, item_b)
+        order = np.argsort(keys)
+        fname = os.path.join(tmp_dir, 'chunk_%d' % len(fnames))
+        writer = RunWriter(fname)
+        writer.write(keys[order], counts[order])
+        writer.close()
+        fnames.append(fname)
+
+    chunk, chunk_bytes = [], 0
+    for basket in baskets:
+        basket = list(set(basket))
+        if len(basket) < 2:
+            continue
+        basket_bytes = len(basket) ** 2 * PRODUCT_BYTES
+        if chunk != [] and chunk_bytes + basket_bytes > memory_budget:
+            spill(chunk)
+            chunk, chunk_bytes = [], 0
+        chunk += [basket]
+        chunk_bytes += basket_bytes
+    if chunk != []:
+        spill(chunk)
+    return merge_all_runs(fnames, os.path.join(tmp_dir, 'chunk'),
+        memory_budget, reduce=True)
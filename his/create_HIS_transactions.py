@@ -7,10 +7,16 @@ import time
 import sys
 import csv
 from collections import OrderedDict
+from his_tokenizer import HISTokenizer, tokenize_file
+import inverted_index
+import multiprocessing
+import transaction_store
 
 ### This script takes the symptoms and herbs prescribed to each patient, and
 ### attempts to mine the frequent patterns from these two sets across all of
-### the patients in the HIS dataset. Also creates an inverted index.
+### the patients in the HIS dataset. Also creates an inverted index, and the
+### binary transaction store that the miners read, with a compressed inverted
+### index over it for queries.
 ### Run time: 20 seconds.
 
 def get_dictionary_elements(element_type):
@@ -23,53 +29,48 @@ def get_dictionary_elements(element_type):
     f.close()
     return all_elements
 
-def get_transactions_and_inverse_index(all_herbs, all_symptoms):
+def get_transactions_and_inverse_index(all_herbs, all_symptoms,
+    num_processes=1):
+    '''
+    Returns each transaction as a (symptom ids, herb ids) pair, and the
+    inverted index as a dictionary mapping each herb and symptom to the line
+    numbers it appears on.
+    '''
+    herb_and_symptoms = all_herbs + all_symptoms
+    tokenizer = HISTokenizer(all_herbs, all_symptoms)
     # Inverted index creation.
     invert_index_dct = {}
     transactions = []
-    f = open('./data/HIS_clean_data.txt', 'r')
-    for i, line in enumerate(f):
-        # Skip header
-        if i == 0:
-            continue
-        line = line.replace('，',' ').replace('。',' ')
-        line = line.replace('、', ' ').replace('颗粒', '').replace('免煎', '')
-        line = line.replace('小', '').replace('中药:', '')
-        date, symptoms, herbs = line.split('\t')
-        symptoms = symptoms.split()
-        # Each row is a unique transaction.
-        current_herbs = []
-        # Remove herbs not mined.
-        for herb in herbs.split('  '):
-            herb = herb.strip()
-            if herb in all_herbs:
-                current_herbs += [herb]
-
-        current_symptoms = []
-        # Remove symptoms not mined.
-        for symptom in symptoms:
-            if symptom in all_symptoms:
-                current_symptoms += [symptom]
-
+    # Line numbers start at 1 after the header.
+    for i, (symptom_ids, herb_ids) in enumerate(tokenize_file(
+        './data/HIS_clean_data.txt', tokenizer, num_processes), 1):
         # Add element to the inverted index.
-        for element in current_symptoms + current_herbs:
+        for item in symptom_ids + herb_ids:
+            element = herb_and_symptoms[item]
             if element in invert_index_dct:
                 invert_index_dct[element] += [str(i)]
             else:
                 invert_index_dct[element] = [str(i)]
-        transactions += [(current_symptoms, current_herbs)]
-    f.close()
+        transactions += [(symptom_ids, herb_ids)]
     return transactions, invert_index_dct
 
+def read_transactions():
+    '''
+    Returns the HIS transactions as lists of integer item ids. Item ids index
+    into the herbs followed by the symptoms.
+    '''
+    return transaction_store.TransactionStore().to_lists()
+
 def main():
     reload(sys)
     sys.setdefaultencoding('cp1252')
 
     all_herbs = get_dictionary_elements('herb')
     all_symptoms = get_dictionary_elements('sym')
+    herb_and_symptoms = all_herbs + all_symptoms
 
     transactions, invert_index_dct = get_transactions_and_inverse_index(
-        all_herbs, all_symptoms)
+        all_herbs, all_symptoms, multiprocessing.cpu_count())
 
     # Write out to a CSV file.
     out = open('./data/HIS_transactions_words.csv', 'w')
@@ -78,22 +79,24 @@ def main():
         if len(symptoms) == 0 or len(herbs) == 0:
             print i
             continue
-        out.write(','.join(symptoms) + '\t' + ','.join(herbs) + '\n')
+        out.write(','.join(herb_and_symptoms[item] for item in symptoms) +
+            '\t' + ','.join(herb_and_symptoms[item] for item in herbs) + '\n')
     out.close()
 
-    # Change the herbs and symptoms to their corresponding indices.
-    herb_and_symptoms = all_herbs + all_symptoms
-    for i, transaction in enumerate(transactions):
-        transaction = transaction[0] + transaction[1]
-        transactions[i] = [str(herb_and_symptoms.index(item)
-            ) for item in transaction]
+    # Lump the herb and symptom indices together.
+    transactions = [symptoms + herbs for symptoms, herbs in transactions]
 
     # Write out to a CSV file.
     out = open('./data/HIS_transactions.csv', 'w')
     for i, transaction in enumerate(transactions):
-        out.write(','.join(transaction) + '\n')
+        out.write(','.join(map(str, transaction)) + '\n')
     out.close()
 
+    # Write out the binary store.
+    transaction_store.write_store(transactions, [(herb, 'herb') for herb in (
+        all_herbs)] + [(symptom, 'symptom') for symptom in all_symptoms])
+    inverted_index.write_index(transaction_store.TransactionStore())
+
     # Write out the inverted index.
     out = open('./data/HIS_inverted_index.txt', 'w')
     for element in invert_index_dct:
@@ -5,6 +5,7 @@
 
 import itertools
 import operator
+from visit_table import load_visit_table
 
 ### This script looks at a patient and gets a timeline for his medical history.
 ### We can see, for each patient, his set of symptoms and herbs. So, if a
@@ -12,24 +13,7 @@ import operator
 
 def get_patient_dct():
     # A patient key is given by both the fake name and the date of birth.
-    patient_dct = {}
-    f = open('./data/HIS_tuple_word.txt', 'r')
-    for i, line in enumerate(f):
-        diseases, name, dob, diagnosis_date, symptoms, herbs = line.split('\t')
-        # Always ends with a colon, so the last element of the split will be
-        # the empty string.
-        diseases = diseases.split(':')[:-1]
-        diagnosis_date = diagnosis_date.split('，')[1][:len('xxxx-xx-xx')]
-        symptoms = symptoms.split(':')[:-1]
-        herbs = herbs.split(':')[:-1]
-        # Add the listing to the dictionary.
-        key, value = (name, dob), [diseases, diagnosis_date, symptoms, herbs]
-        if key in patient_dct:
-            patient_dct[key] += [value]
-        else:
-            patient_dct[key] = [value]
-    f.close()
-    return patient_dct
+    return load_visit_table().get_patient_dct()
 
 # Returns True if date_1 is earlier than date_2.
 def earlier_date(date_1, date_2):
@@ -1,55 +1,96 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import multiprocessing
 import re
 
 ### Author: Edward Huang
 
-# Contains scripts for reading files.
+# Contains scripts for reading files. The raw medical case books are parsed by a
+# state machine over compiled regular expressions, which yields one record per
+# visit. Running the script parses the three books in parallel.
+
+# A new section is denoted by '第xxx章', where xxx is a number.
+SECTION_RE = re.compile('第.*章')
+# A new subsection is denoted by '第xxx节', where xxx is a number.
+SUBSECTION_RE = re.compile('第.*?节(.*)')
+# A new patient is denoted by '初诊：'.
+NEW_PATIENT_RE = re.compile('初诊：')
+# If 'g' occurs multiple times in the current line, then it is an herb vector,
+# unless the line is a visit or a date.
+HERB_LINE_RE = re.compile('(?!.*(?:诊|年))(?:[^g]*g){3}')
+# Punctuation that separates the herbs or symptoms in a list.
+HERB_SEPARATOR_RE = re.compile('、|，|。|,')
+SYMPTOM_SEPARATOR_RE = re.compile('、|，|。|：|,')
 
 # Determine if a string has numbers in it.
 def hasNumbers(inputString):
     return any(char.isdigit() for char in inputString)
 
-# Returns a dictionary where keys are patient ID's. The values are dictionaries.
-# The internal dictionaries have keys herbs, symptoms, section, and subsection.
-def get_patient_dictionary(fname):
-    patient_dct = {}
+def iter_raw_visits(fname):
+    '''
+    Yields a (patient id, section, subsection, symptom line, herb line) tuple
+    for every herb line, where the symptom line is the line before it. A new
+    patient is yielded first with both lines as None.
+    '''
     previous_line = ''
     current_patient_id = -1
     current_section, current_subsection = '', ''
+    # The section and subsection that the current patient was found in.
+    patient_section, patient_subsection = '', ''
     f = open(fname, 'r')
     for line in f:
         line = line.strip()
-        # A new section is denoted by '第xxx章', where xxx is a number.
-        if '第' in line and line.index('第') == 0 and '章' in line:
+        if SECTION_RE.match(line):
             current_section = line.split()[1]
-        # A new subsection is denoted by '第xxx节', where xxx is a number.
-        if '第' in line and line.index('第') == 0 and '节' in line:
-            current_subsection = line[line.index('节') + len('节'):].strip()
+        match = SUBSECTION_RE.match(line)
+        if match:
+            current_subsection = match.group(1).strip()
 
-        # A new patient is denoted by '初诊：'.
-        if '初诊：' in line and line.index('初诊：') == 0:
-            # Initialize the patient's visit list.
+        if NEW_PATIENT_RE.match(line):
             current_patient_id += 1
-            init_dct = ({'herbs' : [], 'symptoms' : [],
-                'section' : current_section, 'subsection' : current_subsection})
-            patient_dct[current_patient_id] = init_dct
-
-        # If 'g' occrus multiple times in the current line, then it is an herb
-        # vector.
-        if line.count('g') > 2 and '诊' not in line and '年' not in line:
-            patient_dct[current_patient_id]['herbs'] += [line.split('。')[0]]
-            patient_dct[current_patient_id]['symptoms'] += [previous_line]
-        previous_line = line[:]
+            patient_section = current_section
+            patient_subsection = current_subsection
+            yield (current_patient_id, patient_section, patient_subsection,
+                None, None)
+
+        if current_patient_id >= 0 and HERB_LINE_RE.match(line):
+            yield (current_patient_id, patient_section, patient_subsection,
+                previous_line, line.split('。')[0])
+        previous_line = line
     f.close()
+
+def iter_patient_records(fname):
+    '''
+    Yields a (patient id, section, subsection, symptoms, herbs) tuple for every
+    visit in a raw medical case book, with cleaned symptom and herb lists.
+    '''
+    for (patient_id, section, subsection, symptom_line, herb_line) in (
+        iter_raw_visits(fname)):
+        if herb_line is None:
+            continue
+        yield (patient_id, section, subsection, get_clean_symptom_list(
+            symptom_line), get_clean_herb_list(herb_line))
+
+# Returns a dictionary where keys are patient ID's. The values are dictionaries.
+# The internal dictionaries have keys herbs, symptoms, section, and subsection.
+def get_patient_dictionary(fname):
+    patient_dct = {}
+    for (patient_id, section, subsection, symptom_line, herb_line) in (
+        iter_raw_visits(fname)):
+        if herb_line is None:
+            # Initialize the patient's visit list.
+            patient_dct[patient_id] = ({'herbs' : [], 'symptoms' : [],
+                'section' : section, 'subsection' : subsection})
+            continue
+        patient_dct[patient_id]['herbs'] += [herb_line]
+        patient_dct[patient_id]['symptoms'] += [symptom_line]
     return patient_dct
 
 # Cleans a list of herbs.
 def get_clean_herb_list(herb_list):
     # Remove Chinese punctuation.
-    herb_list = herb_list.replace('、', ',').replace('，', ',').replace('。', ',')
-    herb_list = herb_list.split(',')
+    herb_list = HERB_SEPARATOR_RE.split(herb_list)
     clean_herb_list = []
     for herb in herb_list:
         # Skip herbs that do not have dosages.
@@ -66,9 +107,7 @@ def get_clean_herb_list(herb_list):
 def get_clean_symptom_list(symptom_list):
     if '日）：' in symptom_list:
         symptom_list = symptom_list[symptom_list.index('日）：') + len('日）：'):]
-    symptom_list = symptom_list.replace('、', ',').replace('，', ',').replace(
-        '。', ',').replace('：', ',')
-    symptom_list = symptom_list.split(',')
+    symptom_list = SYMPTOM_SEPARATOR_RE.split(symptom_list)
     clean_symptom_list = []
     for symptom in symptom_list:
         # Skip symptoms that have numerical descriptions.
@@ -95,22 +134,16 @@ def clean_data(fname):
     return patient_dct
 
 def write_out_files(run_num):
-    patient_dct = clean_data('./data/raw_medical_cases_%d.txt' % run_num)
     out = open('./data/medical_data_%d.txt' % run_num, 'w')
-    for patient_id in patient_dct:
-        # Fetch the attributes for the current patient.
-        patient_att = patient_dct[patient_id]
-        symptom_lists = patient_att['symptoms']
-        herb_lists = patient_att['herbs']
-        assert len(symptom_lists) == len(herb_lists)
-        section = patient_att['section']
-        subsection = patient_att['subsection']
-
-        for i in range(len(symptom_lists)):
-            out.write(','.join(symptom_lists[i]) + '\t' +
-                ','.join(herb_lists[i]) + '\t' + str(patient_id) + '\t' +
-                section + '\t' + subsection + '\n')
+    for (patient_id, section, subsection, symptom_list, herb_list) in (
+        iter_patient_records('./data/raw_medical_cases_%d.txt' % run_num)):
+        out.write(','.join(symptom_list) + '\t' + ','.join(herb_list) + '\t' +
+            str(patient_id) + '\t' + section + '\t' + subsection + '\n')
     out.close()
 
-for i in range(1, 4):
-    write_out_files(i)
\ No newline at end of file
+if __name__ == '__main__':
+    # Each book is parsed in its own process.
+    pool = multiprocessing.Pool(3)
+    pool.map(write_out_files, range(1, 4))
+    pool.close()
+    pool.join()
@@ -3,21 +3,94 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import os
+import sys
 import xlrd
 
+### This script streams the rows of the HIS spreadsheet, sheet by sheet, so that
+### only one sheet is in memory at a time. .xls files are read with xlrd's
+### on-demand loading, and .xlsx files with openpyxl's read-only mode. By
+### default, the first column of every sheet is written to
+### HIS_spreadsheet.txt. Given the date, symptom, and herb columns, the rows
+### are written straight to HIS_clean_data.txt instead.
+
 def upload_xls(filename):
-    # Use cp1252 encoding protocol.
-    book = xlrd.open_workbook(filename, encoding_override='cp1252')   ##To specify UTF8-encoding
+    # Use cp1252 encoding protocol. Sheets are only loaded when asked for.
+    book = xlrd.open_workbook(filename, encoding_override='cp1252',
+        on_demand=True)   ##To specify UTF8-encoding
     return book
 
+def cell_to_str(value):
+    '''
+    Converts a cell value to a UTF-8 string. Whole numbers lose the .0 that
+    spreadsheets give them.
+    '''
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return str(value)
+
+def iter_xls_rows(filename):
+    book = upload_xls(filename)
+    for i in range(book.nsheets):
+        sheet = book.sheet_by_index(i)
+        for row in range(sheet.nrows):
+            yield i, sheet.row_values(row)
+        book.unload_sheet(i)
+    book.release_resources()
+
+def iter_xlsx_rows(filename):
+    # Only needed for .xlsx files.
+    import openpyxl
+    book = openpyxl.load_workbook(filename, read_only=True)
+    for i, sheet in enumerate(book.worksheets):
+        for row in sheet.iter_rows():
+            yield i, [cell.value for cell in row]
+    book.close()
+
+def iter_rows(filename, columns):
+    '''
+    Yields the (sheet index, cells) pair of every row in every sheet, where
+    cells are the given columns as strings. Missing cells are empty.
+    '''
+    if os.path.splitext(filename)[1].lower() == '.xlsx':
+        rows = iter_xlsx_rows(filename)
+    else:
+        rows = iter_xls_rows(filename)
+    for sheet_index, row in rows:
+        yield sheet_index, [cell_to_str(row[column]) if column < len(row) else (
+            '') for column in columns]
+
 if __name__ == '__main__':
-    f = upload_xls('./data/HIS_spreadsheet.xls')
-    # Get the first spreadsheet.
-    sheet = f.sheet_by_index(0)
-    # Get the first column.
-    col = sheet.col_values(0)
-    out = open('./data/HIS_spreadsheet.txt', 'w')
-    for row in col:
-        # Encode each row and write out to file.
-        out.write(row.encode('utf-8') + '\n')
-    out.close()
\ No newline at end of file
+    if len(sys.argv) not in [1, 2, 5]:
+        print 'Usage: %s [spreadsheet [date_col symptom_col herb_col]]' % (
+            sys.argv[0])
+        exit()
+    filename = './data/HIS_spreadsheet.xls'
+    if len(sys.argv) > 1:
+        filename = sys.argv[1]
+
+    if len(sys.argv) == 5:
+        # Skip each sheet's header, and write the clean data's own header.
+        columns = map(int, sys.argv[2:])
+        out = open('./data/HIS_clean_data.txt', 'w')
+        out.write('date\tsymptoms\therbs\n')
+        last_sheet_index = None
+        for sheet_index, cells in iter_rows(filename, columns):
+            if sheet_index != last_sheet_index:
+                last_sheet_index = sheet_index
+                continue
+            # Keep each visit on one line.
+            out.write('\t'.join(cell.replace('\t', ' ').replace('\n', ' ') for (
+                cell) in cells) + '\n')
+        out.close()
+    else:
+        # Get the first column.
+        out = open('./data/HIS_spreadsheet.txt', 'w')
+        for sheet_index, cells in iter_rows(filename, [0]):
+            # Encode each row and write out to file.
+            out.write(cells[0] + '\n')
+        out.close()
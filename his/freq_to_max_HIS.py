@@ -3,20 +3,139 @@
 
 ### Author: Edward Huang
 
-import operator
-import ast
+import heapq
+import os
+import re
+import shutil
 import sys
-from collections import OrderedDict
+import tempfile
 import time
 
+# The itemset tree is shared with the miners in the parent directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from itemset_mining import ItemsetTree
+
 ### This script takes the frequent patterns mined for the HIS data and keeps
-### only the closed patterns.
+### only the maximal patterns. It streams the python-fp-growth output once,
+### spilling each pattern with at least one herb and one symptom into a file
+### per pattern length. Lengths are then read from longest to shortest, so a
+### pattern is maximal exactly when no kept pattern contains it, which an
+### itemset tree answers without comparing against every kept pattern. When the
+### tree grows past MAX_TREE_NODES, it is written out as a chunk and a new tree
+### is started; later chunks are filtered against earlier ones at the end.
+
+# Bounds the memory used by the itemset tree.
+MAX_TREE_NODES = 2000000
+# Every integer in a line of python-fp-growth output. The last is the support.
+INTEGER_RE = re.compile(r'\d+')
+
+def read_id_set(fname):
+    id_set = set([])
+    f = open(fname, 'r')
+    for line in f:
+        id_set.add(int(line.strip()))
+    f.close()
+    return id_set
+
+def split_by_length(fname, all_herbs, all_symptoms, tmp_dir):
+    '''
+    Streams the frequent pattern file, and writes every pattern with at least
+    one herb and one symptom to tmp_dir/length_N.txt, where N is the pattern
+    length. Each line is the support followed by the sorted item ids. Returns
+    the list of lengths seen.
+    '''
+    start_time = time.time()
+    total_bytes = os.path.getsize(fname)
+    bytes_read = 0
+    length_files = {}
+    f = open(fname, 'r')
+    for i, line in enumerate(f):
+        bytes_read += len(line)
+        if i % 1000000 == 0:
+            print '%f%% done, took %f seconds.' % (100.0 * bytes_read /
+                max(total_bytes, 1), time.time() - start_time)
+        integers = map(int, INTEGER_RE.findall(line))
+        if len(integers) < 2:
+            continue
+        pattern, support = sorted(integers[:-1]), integers[-1]
+
+        # Check if we have at least one herb and one symptom.
+        if all_herbs.isdisjoint(pattern) or all_symptoms.isdisjoint(pattern):
+            continue
 
-def has_ele(lst, st):
-    for ele in lst:
-        if ele in st:
-            return True
-    return False
+        length = len(pattern)
+        if length not in length_files:
+            length_files[length] = open(os.path.join(tmp_dir,
+                'length_%d.txt' % length), 'w')
+        length_files[length].write('%d %s\n' % (support, ' '.join(map(str,
+            pattern))))
+    f.close()
+    for length in length_files:
+        length_files[length].close()
+    return sorted(length_files.keys())
+
+def read_patterns(fname):
+    '''
+    Yields the (support, item ids) pairs in a spilled pattern file.
+    '''
+    f = open(fname, 'r')
+    for line in f:
+        line = map(int, line.split())
+        yield line[0], line[1:]
+    f.close()
+
+def write_chunk(chunk, fname):
+    out = open(fname, 'w')
+    for support, pattern in chunk:
+        out.write('%d %s\n' % (support, ' '.join(map(str, pattern))))
+    out.close()
+
+def find_max_chunks(lengths, tmp_dir):
+    '''
+    Reads the patterns from longest to shortest and keeps the ones that no kept
+    pattern contains. Returns the file names of the kept chunks, in order.
+    '''
+    chunk_fnames = []
+    chunk = []
+    tree = ItemsetTree()
+    for length in sorted(lengths, reverse=True):
+        for support, pattern in read_patterns(os.path.join(tmp_dir,
+            'length_%d.txt' % length)):
+            if tree.contains_superset(pattern):
+                continue
+            tree.insert(pattern)
+            chunk += [(support, pattern)]
+            # Spill the tree to disk when it gets too big.
+            if tree.num_nodes > MAX_TREE_NODES:
+                chunk_fnames += [os.path.join(tmp_dir, 'chunk_%d.txt' % len(
+                    chunk_fnames))]
+                write_chunk(chunk, chunk_fnames[-1])
+                chunk = []
+                tree = ItemsetTree()
+    chunk_fnames += [os.path.join(tmp_dir, 'chunk_%d.txt' % len(
+        chunk_fnames))]
+    write_chunk(chunk, chunk_fnames[-1])
+    return chunk_fnames
+
+def filter_chunks(chunk_fnames):
+    '''
+    Patterns in a chunk were never checked against the earlier chunks. Loads one
+    chunk at a time into a tree, and removes the patterns it contains from every
+    later chunk. Afterwards, sorts each chunk by support, descending.
+    '''
+    for i, fname in enumerate(chunk_fnames):
+        chunk = list(read_patterns(fname))
+        chunk.sort(key=lambda x: x[0], reverse=True)
+        write_chunk(chunk, fname)
+        if i == len(chunk_fnames) - 1:
+            break
+        tree = ItemsetTree()
+        for support, pattern in chunk:
+            tree.insert(pattern)
+        for later_fname in chunk_fnames[i + 1:]:
+            write_chunk([(support, pattern) for support, pattern in (
+                read_patterns(later_fname)) if not tree.contains_superset(
+                pattern)], later_fname)
 
 if __name__ == '__main__':
     reload(sys)
@@ -30,75 +149,31 @@ if __name__ == '__main__':
         drug_and_symptoms += [line.strip()]
     f.close()
 
-    all_herbs = set([])
-    f = open('./data/HIS_herbs.txt', 'r')
-    for line in f:
-        all_herbs.add(drug_and_symptoms[int(line.strip())])
-    f.close()
-
-    all_symptoms = set([])
-    f = open('./data/HIS_symptoms.txt', 'r')
-    for line in f:
-        all_symptoms.add(drug_and_symptoms[int(line.strip())])
-    f.close()
+    all_herbs = read_id_set('./data/HIS_herbs.txt')
+    all_symptoms = read_id_set('./data/HIS_symptoms.txt')
 
-    max_patterns = []
-    pat_sup_dct = {}
+    tmp_dir = tempfile.mkdtemp(dir='./data')
+    lengths = split_by_length('./data/HIS_frequent_patterns.txt', all_herbs,
+        all_symptoms, tmp_dir)
+    print 'Finding max patterns, took %f seconds.' % (time.time() - start_time)
+    chunk_fnames = find_max_chunks(lengths, tmp_dir)
+    filter_chunks(chunk_fnames)
 
-    f = open('./data/HIS_frequent_patterns.txt', 'r')
-    for i, line in enumerate(f):
-        if i % 100000 == 0:
-            print str(i / float(113247382)) + "%",
-            print ' done, took %f seconds.' % (time.time() - start_time)
-        # Parse file contents.
-        close_bracket_index = line.index(']') + 1
-        curr_pattern = line[:close_bracket_index]
-        support = line[close_bracket_index:]
-        # Convert the literal string interpretation of a list to an actual list.
-        curr_pattern = ast.literal_eval(curr_pattern)
-        # Convert the pattern to a set.
-        curr_pattern = set(map(int, curr_pattern))
-
-        # Check if we have at least one herb and one symptom.
-        test_pattern = [drug_and_symptoms[ele] for ele in curr_pattern]
-        if not has_ele(test_pattern, all_herbs) or not has_ele(test_pattern, all_symptoms):
-            continue
-
-        pat_sup_dct[tuple(curr_pattern)] = int(support)
-
-        # Check if the current pattern is a subset of something we have
-        # previously seen. Also find the patterns which are bad.
-        isMax = True
-        bad_patterns = []
-        for pattern in max_patterns:
-            if curr_pattern < pattern:
-                isMax = False
-                break
-            if curr_pattern > pattern:
-                bad_patterns += [pattern]
-        # Delete the bad patterns from the set.
-        for pattern in bad_patterns:
-            max_patterns.remove(pattern)
-        if isMax:
-            max_patterns += [curr_pattern]
-    f.close()
-
-    # Sort the pattern dictionary by support count.
-    pat_sup_dct = sorted(pat_sup_dct.items(), key=lambda x: x[1], reverse=True)
-
-    # Write out the closed patterns.
+    # Merge the sorted chunks, and write out the maximal patterns.
     out = open('./results/HIS_max_patterns.txt', 'w')
-    for pattern, support in pat_sup_dct:
-        if set(pattern) not in max_patterns:
-            continue
-        pattern = [drug_and_symptoms[item] for item in pattern]
+    for support, pattern in heapq.merge(*[((-support, pattern) for (support,
+        pattern) in read_patterns(fname)) for fname in chunk_fnames]):
         herbs = []
         symptoms = []
-        for ele in pattern:
-            if ele in all_herbs:
-                herbs += [ele]
+        for item in pattern:
+            if item in all_herbs:
+                herbs += [drug_and_symptoms[item]]
             else:
-                assert ele in all_symptoms
-                symptoms += [ele]
-        out.write(str(support) + '\t' + ','.join(herbs) + '\t' + ','.join(symptoms) + '\n')
-    out.close()
\ No newline at end of file
+                assert item in all_symptoms
+                symptoms += [drug_and_symptoms[item]]
+        out.write(str(-support) + '\t' + ','.join(herbs) + '\t' + ','.join(
+            symptoms) + '\n')
+    out.close()
+    shutil.rmtree(tmp_dir)
+
+    print '---%f seconds---' % (time.time() - start_time)
@@ -4,10 +4,13 @@
 
 from discontinued_herbs import *
 import math
+from significance import benjamini_hochberg, hypergeometric_sf
 
 ### This script provides functions for retrieving basic statistics on the time
 ### series data. Writes out disease complications, side effects, treatments, and
-### good symptoms.
+### good symptoms. Side effects and treatments are written with the
+### hypergeometric p-value of their count, given the number of patients with
+### the herb and with the symptom, and its Benjamini-Hochberg q-value.
 
 # Input is list, outputs the index of the first '1'.
 def get_first_one(vector):
@@ -72,6 +75,17 @@ def combine_vectors(vec_lst):
     return result
     # return [ele / float(sum(result)) for ele in result]
 
+# Input is a dictionary from (herb, symptom) pairs to counts. Returns two
+# dictionaries from the pairs to their p-values and q-values.
+def get_significance(pair_count_dct, herb_counts, symptom_counts, num_patients):
+    pairs = pair_count_dct.keys()
+    p_values = hypergeometric_sf([pair_count_dct[pair] for pair in pairs],
+        [herb_counts[herb] for herb, symptom in pairs],
+        [symptom_counts[symptom] for herb, symptom in pairs], num_patients)
+    q_values = benjamini_hochberg(p_values)
+    return (dict(zip(pairs, p_values.tolist())), dict(zip(pairs,
+        q_values.tolist())))
+
 # Consolidates the probability vectors for the symptoms.
 def write_probabilities(element_vectors, key):
     element_probs = {}
@@ -119,6 +133,7 @@ def main():
     failed_treatment_dct = {}
     herb_counts = {}
     symptom_counts = {}
+    num_patients = 0
     # Keys are symptoms, values are sums of time series across all patient
     # visits.
     symptom_vectors = {}
@@ -133,6 +148,7 @@ def main():
         if (False not in [vector == [] for vector in symptoms] or
             False not in [vector == [] for vector in herbs]):
             continue
+        num_patients += 1
 
         symptom_occurrence_dct = get_occurrence_dct(symptoms)
         herb_occurrence_dct = get_occurrence_dct(herbs)
@@ -239,15 +255,19 @@ def main():
             symptom)] / math.sqrt(herb_count * symptom_count)
 
     # Write out herb side effects.
+    p_value_dct, q_value_dct = get_significance(side_effect_dct, herb_counts,
+        symptom_counts, num_patients)
     sorted_side_effects = sorted(normalized_side_effect_dct.items(),
         key=operator.itemgetter(1), reverse=True)
     out = open('./results/side_effects.txt', 'w')
-    out.write('herb\therb_count\tsymptom\tsymptom_count\tnormalized_count\n')
+    out.write('herb\therb_count\tsymptom\tsymptom_count\tnormalized_count\t')
+    out.write('p_value\tq_value\n')
     for (herb, symptom), normalized_count in sorted_side_effects:
         if side_effect_dct[(herb, symptom)] < 5:
             continue
-        out.write('%s\t%d\t%s\t%d\t%f\n' % (herb, herb_counts[herb], symptom,
-            symptom_counts[symptom], normalized_count))
+        out.write('%s\t%d\t%s\t%d\t%f\t%g\t%g\n' % (herb, herb_counts[herb],
+            symptom, symptom_counts[symptom], normalized_count, p_value_dct[(
+            herb, symptom)], q_value_dct[(herb, symptom)]))
     out.close()
 
     # Sort by successes - failures.
@@ -262,13 +282,16 @@ def main():
         # Normalize counts.
         denom = math.sqrt(herb_count * symptom_count)
         success_minus_failure_dct[key] = difference / denom
-    # Write out treatment successes and failures.
+    # Write out treatment successes and failures, with the significance of the
+    # success counts.
+    p_value_dct, q_value_dct = get_significance(successful_treatment_dct,
+        herb_counts, symptom_counts, num_patients)
     sorted_treatments = sorted(success_minus_failure_dct.items(),
         key=operator.itemgetter(1), reverse=True)
     out = open('./results/herb_treatments_successes_and_failures.txt', 'w')
     # Write header line.
     out.write('herb\therb_count\tsymptom\tsymptom_count\tsuccess_count\t')
-    out.write('failure_count\tdifference/sqrt(hc*sc)\n')
+    out.write('failure_count\tdifference/sqrt(hc*sc)\tp_value\tq_value\n')
     for (herb, symptom), count in sorted_treatments:
         success_count = successful_treatment_dct[(herb, symptom)]
         if success_count < 5:
@@ -276,9 +299,10 @@ def main():
         failure_count = 0
         if (herb, symptom) in failed_treatment_dct:
             failure_count = failed_treatment_dct[(herb, symptom)]
-        out.write('%s\t%d\t%s\t%d\t%d\t%d\t%f\n' % (herb, herb_counts[herb],
-            symptom, symptom_counts[symptom], success_count, failure_count,
-            count))
+        out.write('%s\t%d\t%s\t%d\t%d\t%d\t%f\t%g\t%g\n' % (herb,
+            herb_counts[herb], symptom, symptom_counts[symptom], success_count,
+            failure_count, count, p_value_dct[(herb, symptom)], q_value_dct[(
+            herb, symptom)]))
     out.close()
 
     write_probabilities(symptom_vectors, 'symptom')
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+### Author: Edward Huang
+
+import itertools
+import multiprocessing
+import re
+
+### This module tokenizes the lines of HIS_clean_data.txt into herb and symptom
+### ids. Punctuation and the noise words are removed in one regular expression
+### pass, and the tokens are looked up in dictionaries built from herb_dct.txt
+### and sym_dct.txt instead of lists. Tokens that are not in a dictionary can
+### optionally be segmented into dictionary words with a trie. Item ids index
+### into the herbs followed by the symptoms, as in create_HIS_transactions.py.
+
+# Punctuation becomes a space, and noise words are removed.
+NOISE_REPLACEMENTS = {'，' : ' ', '。' : ' ', '、' : ' ', '颗粒' : '',
+    '免煎' : '', '小' : '', '中药:' : ''}
+# Longer replacements go first, so that a word wins over its prefix.
+NOISE_RE = re.compile('|'.join(re.escape(noise) for noise in sorted(
+    NOISE_REPLACEMENTS, key=len, reverse=True)))
+# Number of lines that a worker process tokenizes at a time.
+CHUNK_SIZE = 10000
+
+def clean_line(line):
+    return NOISE_RE.sub(lambda match: NOISE_REPLACEMENTS[match.group(0)], line)
+
+def build_trie(id_dct):
+    '''
+    Returns a trie over the bytes of each word in id_dct, as nested
+    dictionaries. The None key of a node holds the id of the word ending there.
+    '''
+    trie = {}
+    for word, item in id_dct.items():
+        node = trie
+        for byte in word:
+            node = node.setdefault(byte, {})
+        node[None] = item
+    return trie
+
+def segment(token, trie):
+    '''
+    Splits a token into dictionary words by forward maximum matching: the
+    longest word starting at each position is taken, and characters that start
+    no word are skipped. Returns the ids of the words.
+    '''
+    ids = []
+    i = 0
+    while i < len(token):
+        node = trie
+        match = None
+        j = i
+        while j < len(token) and token[j] in node:
+            node = node[token[j]]
+            j += 1
+            if None in node:
+                match = (j, node[None])
+        if match is not None:
+            i, item = match
+            ids += [item]
+            continue
+        # Skip to the start of the next UTF-8 character.
+        i += 1
+        while i < len(token) and 0x80 <= ord(token[i]) < 0xc0:
+            i += 1
+    return ids
+
+class HISTokenizer(object):
+    '''
+    Maps the lines of HIS_clean_data.txt to (symptom ids, herb ids) pairs.
+    Herbs are separated by two spaces and symptoms by whitespace. If segment
+    is True, tokens not in the dictionaries are segmented with a trie.
+    '''
+    def __init__(self, all_herbs, all_symptoms, segment=False):
+        self.herb_id_dct, self.symptom_id_dct = {}, {}
+        for i, herb in enumerate(all_herbs):
+            self.herb_id_dct.setdefault(herb, i)
+        for i, symptom in enumerate(all_symptoms):
+            self.symptom_id_dct.setdefault(symptom, len(all_herbs) + i)
+        self.herb_trie, self.symptom_trie = None, None
+        if segment:
+            self.herb_trie = build_trie(self.herb_id_dct)
+            self.symptom_trie = build_trie(self.symptom_id_dct)
+
+    def get_ids(self, tokens, id_dct, trie):
+        ids = []
+        for token in tokens:
+            if token in id_dct:
+                ids += [id_dct[token]]
+            elif trie is not None:
+                ids += segment(token, trie)
+        return ids
+
+    def tokenize(self, line):
+        date, symptoms, herbs = clean_line(line).split('\t')
+        symptom_ids = self.get_ids(symptoms.split(), self.symptom_id_dct,
+            self.symptom_trie)
+        herb_ids = self.get_ids([herb.strip() for herb in herbs.split('  ')],
+            self.herb_id_dct, self.herb_trie)
+        return symptom_ids, herb_ids
+
+# The tokenizer of a worker process, set once by the pool initializer.
+worker_tokenizer = None
+
+def init_worker(tokenizer):
+    global worker_tokenizer
+    worker_tokenizer = tokenizer
+
+def tokenize_chunk(lines):
+    return [worker_tokenizer.tokenize(line) for line in lines]
+
+def tokenize_file(fname, tokenizer, num_processes=1):
+    '''
+    Yields the (symptom ids, herb ids) pair of every line after the header, in
+    order. With more than one process, chunks of CHUNK_SIZE lines are
+    tokenized by a pool of processes.
+    '''
+    f = open(fname, 'r')
+    # Skip header
+    f.readline()
+    if num_processes == 1:
+        for line in f:
+            yield tokenizer.tokenize(line)
+    else:
+        chunks = iter(lambda: list(itertools.islice(f, CHUNK_SIZE)), [])
+        pool = multiprocessing.Pool(num_processes, init_worker, (tokenizer,))
+        for chunk in pool.imap(tokenize_chunk, chunks):
+            for pair in chunk:
+                yield pair
+        pool.close()
+        pool.join()
+    f.close()
@@ -0,0 +1,193 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+### Author: Edward Huang
+
+import numpy as np
+import sys
+import time
+import transaction_store
+
+### This module stores, for every herb and symptom, the sorted ids of the visits
+### (rows of HIS_transactions.csv) that contain it. Each posting list is delta
+### encoded and packed as varints into one memory-mapped byte array, and is
+### decoded with vectorized NumPy operations when a query needs it. Queries
+### AND together clauses, where each clause is an OR of herbs and symptoms,
+### and any herb or symptom can be negated. Running the script prints the
+### number of visits that match a query, e.g. 'herb_1 symptom_1|symptom_2
+### -herb_2' counts the visits with herb_1, either symptom, and not herb_2.
+
+INDEX_PREFIX = './data/HIS_index'
+# The largest number of bytes in a varint, enough for 63-bit values.
+MAX_VARINT_BYTES = 9
+
+def encode_varints(values):
+    '''
+    Packs non-negative integers into bytes, seven bits at a time from the
+    lowest. The high bit of a byte is set if more bytes of the value follow.
+    '''
+    values = np.asarray(values, dtype=np.uint64)
+    num_bytes = np.ones(len(values), dtype=np.int64)
+    for j in range(1, MAX_VARINT_BYTES):
+        num_bytes += values >= np.uint64(1 << (7 * j))
+    starts = np.cumsum(num_bytes) - num_bytes
+    blob = np.zeros(num_bytes.sum(), dtype=np.uint8)
+    for j in range(num_bytes.max() if len(values) > 0 else 0):
+        has_byte = num_bytes > j
+        low_bits = (values[has_byte] >> np.uint64(7 * j)) & np.uint64(0x7f)
+        # Set the continuation bit on every byte but the last.
+        low_bits |= (num_bytes[has_byte] > j + 1).astype(np.uint64) << (
+            np.uint64(7))
+        blob[starts[has_byte] + j] = low_bits
+    return blob
+
+def decode_varints(blob):
+    '''
+    Unpacks the integers packed by encode_varints.
+    '''
+    blob = np.asarray(blob, dtype=np.uint8)
+    if len(blob) == 0:
+        return np.zeros(0, dtype=np.int64)
+    is_last = (blob & 0x80) == 0
+    # Each byte's value index, and the position of the value's first byte.
+    value_ids = np.cumsum(is_last) - is_last
+    value_starts = np.flatnonzero(np.concatenate(([True], is_last[:-1])))
+    shifts = 7 * (np.arange(len(blob)) - value_starts[value_ids])
+    low_bits = (blob & 0x7f).astype(np.int64) << shifts
+    return np.add.reduceat(low_bits, value_starts)
+
+def encode_postings(tids):
+    '''
+    Delta encodes a sorted list of visit ids, and packs the gaps as varints.
+    '''
+    tids = np.asarray(tids, dtype=np.int64)
+    return encode_varints(np.diff(tids, prepend=0) if len(tids) > 0 else tids)
+
+def decode_postings(blob):
+    return np.cumsum(decode_varints(blob))
+
+def write_index(store, prefix=INDEX_PREFIX):
+    '''
+    Writes the posting list of every item in a TransactionStore. The posting
+    lists are concatenated into one byte array, with int64 offsets and the
+    number of visits in each list.
+    '''
+    blobs = [encode_postings(store.get_tids(item)) for item in range(
+        store.num_items)]
+    offsets = np.zeros(store.num_items + 1, dtype=np.int64)
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+    np.save(prefix + '_postings.npy', np.concatenate(blobs) if len(blobs) > (
+        0) else np.zeros(0, dtype=np.uint8))
+    np.save(prefix + '_offsets.npy', offsets)
+    np.save(prefix + '_counts.npy', np.concatenate((store.get_supports(),
+        [len(store)])).astype(np.int64))
+
+def intersect(tids_a, tids_b):
+    '''
+    Intersects two sorted arrays of visit ids. Every id of the shorter array is
+    binary searched in the longer one, so the cost grows with the shorter
+    array, as with galloping search.
+    '''
+    if len(tids_a) > len(tids_b):
+        tids_a, tids_b = tids_b, tids_a
+    if len(tids_a) == 0:
+        return tids_a
+    positions = np.searchsorted(tids_b, tids_a)
+    positions[positions == len(tids_b)] = 0
+    return tids_a[tids_b[positions] == tids_a]
+
+def difference(tids_a, tids_b):
+    '''
+    Returns the visit ids in tids_a that are not in tids_b.
+    '''
+    if len(tids_a) == 0 or len(tids_b) == 0:
+        return tids_a
+    positions = np.searchsorted(tids_b, tids_a)
+    positions[positions == len(tids_b)] = 0
+    return tids_a[tids_b[positions] != tids_a]
+
+class InvertedIndex(object):
+    '''
+    Read-only view of an index written by write_index. Herbs and symptoms can
+    be given as words or item ids.
+    '''
+    def __init__(self, prefix=INDEX_PREFIX,
+        store_prefix=transaction_store.STORE_PREFIX):
+        self.postings = np.load(prefix + '_postings.npy', mmap_mode='r')
+        self.offsets = np.load(prefix + '_offsets.npy', mmap_mode='r')
+        counts = np.load(prefix + '_counts.npy', mmap_mode='r')
+        self.counts, self.num_visits = counts[:-1], int(counts[-1])
+        self.item_index_dct = dict((word, item) for item, (word,
+            item_type) in enumerate(transaction_store.read_vocabulary(
+            store_prefix)))
+
+    def get_item(self, item):
+        if isinstance(item, str):
+            return self.item_index_dct[item]
+        return item
+
+    def get_count(self, item):
+        return int(self.counts[self.get_item(item)])
+
+    def get_postings(self, item):
+        '''
+        Returns the sorted ids of the visits that contain item.
+        '''
+        item = self.get_item(item)
+        return decode_postings(self.postings[self.offsets[item]:self.offsets[
+            item + 1]])
+
+    def query(self, clauses, excluded=()):
+        '''
+        Returns the sorted ids of the visits that match every clause, and
+        contain none of the excluded herbs and symptoms. A clause is a list of
+        herbs and symptoms, and matches the visits with any of them. Clauses
+        are intersected from the fewest estimated visits up.
+        '''
+        clauses = [[self.get_item(item) for item in clause] for clause in (
+            clauses)]
+        clauses.sort(key=lambda clause: sum(self.counts[item] for item in (
+            clause)))
+        tids = None
+        for clause in clauses:
+            clause_tids = self.get_postings(clause[0])
+            for item in clause[1:]:
+                clause_tids = np.union1d(clause_tids, self.get_postings(item))
+            tids = clause_tids if tids is None else intersect(tids,
+                clause_tids)
+            if len(tids) == 0:
+                return tids
+        if tids is None:
+            tids = np.arange(self.num_visits, dtype=np.int64)
+        for item in excluded:
+            tids = difference(tids, self.get_postings(item))
+        return tids
+
+    def count(self, clauses, excluded=()):
+        return len(self.query(clauses, excluded))
+
+def parse_query(args):
+    '''
+    Parses query arguments into clauses and excluded items: a|b is a clause
+    matching a or b, and -a excludes the visits with a.
+    '''
+    clauses, excluded = [], []
+    for arg in args:
+        if arg.startswith('-'):
+            excluded += [arg[1:]]
+        else:
+            clauses += [arg.split('|')]
+    return clauses, excluded
+
+def main():
+    if len(sys.argv) < 2:
+        print 'Usage: %s item[|item ...] [-item] ...' % sys.argv[0]
+        exit()
+    index = InvertedIndex()
+    clauses, excluded = parse_query(sys.argv[1:])
+    print index.count(clauses, excluded)
+
+if __name__ == '__main__':
+    start_time = time.time()
+    main()
+    print "---%f seconds---" % (time.time() - start_time)
@@ -0,0 +1,158 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+### Author: Edward Huang
+
+from create_HIS_transactions import get_dictionary_elements
+import multiprocessing
+import os
+import sys
+import time
+import transaction_store
+import vertical_bitsets
+
+# The itemset miners are shared with the ZRS scripts in the parent directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import itemset_mining
+
+### This script mines the transaction store written by
+### create_HIS_transactions.py in-process instead of through
+### python-fp-growth. The freq and closed modes stream out every frequent or
+### closed pattern with its exact support (the eclat mode finds the same
+### patterns as freq, on packed bitsets, and the parallel mode finds them on
+### every core, sorted by support), and the max mode writes only the maximal
+### patterns, sorted by support. Every pattern has at least one herb and one
+### symptom, which the miners enforce during the search instead of
+### discarding patterns afterwards. With incremental, the freq or max
+### patterns are kept in a state file, and later runs only mine the
+### transactions appended since the last run. The topk and topk_max modes take
+### k instead of min_support, and keep the k patterns with the highest
+### supports, or the maximal patterns that cover them.
+
+STATE_FNAME = './data/HIS_%s_state.pkl'
+
+def write_patterns(patterns, herb_and_symptoms, num_herbs, fname):
+    '''
+    Writes out each (item set, support) pair as the support, the herbs, and the
+    symptoms, separated by tabs.
+    '''
+    out = open(fname, 'w')
+    for item_set, support in patterns:
+        herbs = [herb_and_symptoms[item] for item in item_set if (
+            item < num_herbs)]
+        symptoms = [herb_and_symptoms[item] for item in item_set if (
+            item >= num_herbs)]
+        out.write(str(support) + '\t' + ','.join(herbs) + '\t' + ','.join(
+            symptoms) + '\n')
+    out.close()
+
+def update_patterns(transactions, mode, min_support, constraint, terms):
+    '''
+    Updates the patterns in the state file with the transactions appended since
+    it was written, or mines every transaction if there is no state with the
+    same settings. terms are the (word, type) pairs of the item ids, since
+    adding a herb to the dictionary shifts the ids of every symptom, and the
+    stored ids are mapped to the new ones through their terms. Every
+    transaction is mined again if a term was removed or changed type, or if
+    the transactions already mined have changed. Returns the patterns.
+    '''
+    fname = STATE_FNAME % mode
+    state = None
+    if os.path.exists(fname):
+        state = itemset_mining.read_state(fname)
+        new_ids = dict((term, i) for i, term in enumerate(terms))
+        if state['min_support'] != min_support or state['constraint'][3] != (
+            constraint['max_len']) or 'terms' not in state or any(term not in (
+            new_ids) for term in state['terms']):
+            print 'Dictionary or settings changed, mining every transaction...'
+            state = None
+        else:
+            itemset_mining.remap_state(state, dict((i, new_ids[term]) for i,
+                term in enumerate(state['terms'])))
+            if not itemset_mining.matches_state(state, transactions):
+                print 'Mined transactions changed, mining every transaction...'
+                state = None
+    if state is None:
+        state = itemset_mining.create_state(transactions, min_support, mode,
+            **constraint)
+    else:
+        new_transactions = transactions[state['num_transactions']:]
+        print 'Updating with %d new transactions...' % len(new_transactions)
+        itemset_mining.update_state(state, new_transactions,
+            constraint['item_class'])
+    state['terms'] = terms
+    itemset_mining.write_state(state, fname)
+    return state['patterns']
+
+def main():
+    args = sys.argv[1:]
+    incremental = len(args) > 0 and args[0] == 'incremental'
+    if incremental:
+        args = args[1:]
+    modes = ['freq', 'max'] if incremental else ['freq', 'eclat', 'parallel',
+        'closed', 'max', 'topk', 'topk_max']
+    if len(args) not in [2, 3] or args[0] not in modes:
+        print ('Usage: %s [incremental] freq/eclat/parallel/closed/max '
+            'min_support [max_len]' % sys.argv[0])
+        print '       %s topk/topk_max k [max_len]' % sys.argv[0]
+        exit()
+    # For the topk modes, this is k.
+    mode, min_support = args[0], int(args[1])
+    max_len = None
+    if len(args) == 3:
+        max_len = int(args[2])
+
+    all_herbs = get_dictionary_elements('herb')
+    all_symptoms = get_dictionary_elements('sym')
+    herb_and_symptoms = all_herbs + all_symptoms
+    item_class = ['herb'] * len(all_herbs) + ['symptom'] * len(all_symptoms)
+    constraint = {'item_class' : item_class, 'required_classes' : ['herb',
+        'symptom'], 'max_len' : max_len}
+
+    store = transaction_store.TransactionStore()
+    # The eclat mode only needs the item -> transaction ids view.
+    if mode != 'eclat':
+        transactions = store.to_lists()
+    if incremental:
+        patterns = sorted(update_patterns(transactions, mode, min_support,
+            constraint, zip(herb_and_symptoms, item_class)).items(),
+            key=lambda x: x[1], reverse=True)
+        write_patterns(patterns, herb_and_symptoms, len(all_herbs),
+            './results/HIS_%s_patterns.txt' % mode)
+    elif mode == 'freq':
+        write_patterns(itemset_mining.fpgrowth(transactions, min_support,
+            **constraint), herb_and_symptoms, len(all_herbs),
+            './results/HIS_freq_patterns.txt')
+    elif mode == 'eclat':
+        bitsets = vertical_bitsets.build_store_bitsets(store)
+        write_patterns(vertical_bitsets.eclat(bitsets, min_support,
+            **constraint), herb_and_symptoms, len(all_herbs),
+            './results/HIS_freq_patterns.txt')
+    elif mode == 'parallel':
+        write_patterns(itemset_mining.parallel_fpgrowth(transactions,
+            min_support, multiprocessing.cpu_count(), **constraint),
+            herb_and_symptoms, len(all_herbs),
+            './results/HIS_freq_patterns.txt')
+    elif mode == 'closed':
+        write_patterns(itemset_mining.charm(transactions, min_support,
+            **constraint), herb_and_symptoms, len(all_herbs),
+            './results/HIS_closed_patterns.txt')
+    elif mode == 'max':
+        max_patterns = itemset_mining.fpmax(transactions, min_support,
+            **constraint)
+        max_patterns = sorted(max_patterns.items(), key=lambda x: x[1],
+            reverse=True)
+        write_patterns(max_patterns, herb_and_symptoms, len(all_herbs),
+            './results/HIS_max_patterns.txt')
+    elif mode in ['topk', 'topk_max']:
+        top_patterns = itemset_mining.topk(transactions, min_support,
+            maximal=(mode == 'topk_max'), **constraint)
+        if len(top_patterns) > 0:
+            print 'Support of the top patterns: %d' % top_patterns[-1][1]
+        write_patterns(top_patterns, herb_and_symptoms, len(all_herbs),
+            './results/HIS_%s_patterns.txt' % mode)
+
+if __name__ == '__main__':
+    start_time = time.time()
+    main()
+    print "---%f seconds---" % (time.time() - start_time)
@@ -0,0 +1,240 @@
+### Author: Edward Huang
+
+import math
+import numpy as np
+from cooccurrence import get_pair_keys, split_pair_keys
+
+### This module finds the frequent item pairs of a stream of visits in one pass
+### and little memory. A Count-Min sketch estimates the weight of any pair, and
+### a weighted Space-Saving table keeps the heaviest pairs. Both only ever
+### overestimate, so every reported count comes with a lower and an upper
+### bound, and the final top pairs can be counted exactly in a second pass.
+### Pairs are buffered and summed with NumPy, and each batch of distinct pairs
+### updates both tables at once.
+
+# Default relative error and failure probability of the Count-Min sketch.
+EPSILON = 0.0001
+DELTA = 0.01
+# Number of buffered pairs that are summed and added as one batch.
+BATCH_SIZE = 2 ** 16
+
+class CountMinSketch(object):
+    '''
+    A depth by width table of counts, with one multiply-shift hash per row.
+    An estimate exceeds the true weight by at most epsilon times the total
+    weight, with probability 1 - delta.
+    '''
+    def __init__(self, epsilon=EPSILON, delta=DELTA, seed=0):
+        # The width is rounded up to a power of two for the hash.
+        self.num_bits = int(math.ceil(math.log(math.e / epsilon, 2)))
+        self.epsilon = math.e / 2 ** self.num_bits
+        self.delta = delta
+        depth = int(math.ceil(math.log(1 / delta)))
+        self.table = np.zeros((depth, 2 ** self.num_bits), dtype=np.int64)
+        rng = np.random.RandomState(seed)
+        # Odd multipliers and offsets of the hashes, as 64-bit integers.
+        self.multipliers = (rng.randint(0, 2 ** 62, size=depth).astype(
+            np.uint64) << np.uint64(1)) | np.uint64(1)
+        self.offsets = rng.randint(0, 2 ** 62, size=depth).astype(np.uint64)
+        self.total = 0
+
+    def get_indices(self, row, keys):
+        # Products wrap around modulo 2^64, and the top bits are the index.
+        hashed = keys.astype(np.uint64) * self.multipliers[row] + self.offsets[
+            row]
+        return (hashed >> np.uint64(64 - self.num_bits)).astype(np.int64)
+
+    def add(self, keys, weights):
+        keys = np.asarray(keys, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.int64)
+        for row in range(len(self.table)):
+            np.add.at(self.table[row], self.get_indices(row, keys), weights)
+        self.total += int(weights.sum())
+
+    def estimate(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        return np.min([self.table[row][self.get_indices(row, keys)] for row in (
+            range(len(self.table)))], axis=0)
+
+    def get_error_bound(self):
+        return self.epsilon * self.total
+
+class SpaceSaving(object):
+    '''
+    Weighted Space-Saving over at most capacity keys, updated a batch of
+    distinct keys at a time. Keys in the table add their weights. New keys
+    start at the smallest count of the full table, which becomes their error,
+    plus their weights, and then only the capacity largest counts are kept.
+    The smallest count never drops, so a key not in the table has weight at
+    most the smallest count, and a count exceeds the key's true weight by at
+    most its error.
+    '''
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # Keys in increasing order, with their counts and errors.
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.errors = np.zeros(0, dtype=np.int64)
+        self.total = 0
+
+    def add(self, keys, weights):
+        '''
+        Adds a batch of distinct keys with their weights.
+        '''
+        self.total += int(weights.sum())
+        min_count = self.get_min_count()
+        positions = np.searchsorted(self.keys, keys)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == keys[found]
+        self.counts[positions[found]] += weights[found]
+        keys = np.concatenate((self.keys, keys[~found]))
+        counts = np.concatenate((self.counts, min_count + weights[~found]))
+        errors = np.concatenate((self.errors, np.repeat(min_count, np.sum(
+            ~found))))
+        if len(keys) > self.capacity:
+            kept = np.argpartition(-counts, self.capacity - 1)[:self.capacity]
+            keys, counts, errors = keys[kept], counts[kept], errors[kept]
+        order = np.argsort(keys)
+        self.keys, self.counts, self.errors = (keys[order], counts[order],
+            errors[order])
+
+    def get_min_count(self):
+        '''
+        Returns the largest weight that a key not in the table may have: the
+        smallest count once the table is full, or 0 before then.
+        '''
+        if len(self.keys) < self.capacity:
+            return 0
+        return int(self.counts.min())
+
+    def get_top(self, k):
+        '''
+        Returns the (keys, counts, errors) arrays of the k largest counts.
+        '''
+        order = np.argsort(-self.counts, kind='mergesort')[:k]
+        return self.keys[order], self.counts[order], self.errors[order]
+
+    def get_error_bound(self):
+        # Every error is a smallest count from before, and counts only grow.
+        return self.get_min_count()
+
+class PairSketch(object):
+    '''
+    Counts weighted (item a, item b) pairs with a Count-Min sketch and a
+    Space-Saving table. The table's counts are capped by the sketch's
+    estimates, which only tightens them.
+    '''
+    def __init__(self, capacity, epsilon=EPSILON, delta=DELTA, seed=0,
+        batch_size=BATCH_SIZE):
+        self.count_min = CountMinSketch(epsilon, delta, seed)
+        self.space_saving = SpaceSaving(capacity)
+        self.batch_size = batch_size
+        self.key_buffer, self.weight_buffer = [], []
+        self.num_buffered = 0
+
+    def add(self, item_a, item_b, weights=None):
+        keys = get_pair_keys(item_a, item_b)
+        if weights is None:
+            weights = np.ones(len(keys), dtype=np.int64)
+        self.key_buffer += [keys]
+        self.weight_buffer += [np.asarray(weights, dtype=np.int64)]
+        self.num_buffered += len(keys)
+        if self.num_buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        '''
+        Sums the weights of the buffered pairs by pair, and adds them to both
+        tables.
+        '''
+        if self.num_buffered == 0:
+            return
+        keys, inverse = np.unique(np.concatenate(self.key_buffer),
+            return_inverse=True)
+        weights = np.bincount(inverse, np.concatenate(
+            self.weight_buffer)).astype(np.int64)
+        self.count_min.add(keys, weights)
+        self.space_saving.add(keys, weights)
+        self.key_buffer, self.weight_buffer = [], []
+        self.num_buffered = 0
+
+    def get_top(self, k):
+        '''
+        Returns the (item a ids, item b ids, estimates, lower bounds) of the k
+        pairs in the table with the largest estimates. Estimates are upper
+        bounds of the true weights.
+        '''
+        self.flush()
+        keys, counts, errors = self.space_saving.get_top(
+            self.space_saving.capacity)
+        estimates = np.minimum(counts, self.count_min.estimate(keys))
+        order = np.argsort(-estimates, kind='mergesort')[:k]
+        item_a, item_b = split_pair_keys(keys[order])
+        return item_a, item_b, estimates[order], (counts - errors)[order]
+
+    def get_error_bounds(self):
+        '''
+        Returns the largest overestimate of a Space-Saving count, which is
+        also the largest weight of a pair not in the table, and of a Count-Min
+        estimate with probability 1 - delta.
+        '''
+        self.flush()
+        return (self.space_saving.get_error_bound(),
+            self.count_min.get_error_bound())
+
+    def separates_top(self, k):
+        '''
+        Returns True if the k-th largest lower bound is above the weight of
+        any pair not in the table, so that every pair of the top k is in the
+        table.
+        '''
+        self.flush()
+        lower_bounds = self.space_saving.counts - self.space_saving.errors
+        if len(lower_bounds) < k:
+            return self.space_saving.get_min_count() == 0
+        return np.sort(lower_bounds)[-k] > self.space_saving.get_min_count()
+
+    def get_threshold(self, estimates):
+        '''
+        Returns the largest weight of a pair outside the top k, given the
+        estimates of get_top(k). These are the (k + 1)-th largest estimate in
+        the table, and the weight of a pair not in the table. A pair whose
+        lower bound reaches the threshold is in the true top k.
+        '''
+        k = len(estimates)
+        all_estimates = self.get_top(self.space_saving.capacity)[2]
+        threshold = self.space_saving.get_min_count()
+        if len(all_estimates) > k:
+            threshold = max(threshold, np.sort(all_estimates)[-k - 1])
+        return threshold
+
+def sketch_pairs(pair_batches, capacity):
+    '''
+    Streams an iterable of (item a ids, item b ids, weights) batches once
+    into a pair sketch of the given capacity, and returns the sketch.
+    '''
+    sketch = PairSketch(capacity)
+    for item_a, item_b, weights in pair_batches:
+        sketch.add(item_a, item_b, weights)
+    sketch.flush()
+    return sketch
+
+def count_pairs_exactly(pair_batches, item_a, item_b):
+    '''
+    Counts the weights of the given pairs exactly, over an iterable of
+    (item a ids, item b ids, weights) batches. Weights of None count one.
+    '''
+    keys = get_pair_keys(item_a, item_b)
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    counts = np.zeros(len(keys), dtype=np.int64)
+    for batch_a, batch_b, weights in pair_batches:
+        batch_keys = get_pair_keys(batch_a, batch_b)
+        if weights is None:
+            weights = np.ones(len(batch_keys), dtype=np.int64)
+        positions = np.searchsorted(sorted_keys, batch_keys)
+        positions[positions == len(sorted_keys)] = 0
+        found = sorted_keys[positions] == batch_keys if len(keys) > 0 else (
+            np.zeros(len(batch_keys), dtype=bool))
+        np.add.at(counts, order[positions[found]], np.asarray(weights)[found])
+    return counts
@@ -1,136 +1,333 @@
 ### Author: Edward Huang
 
-import itertools
+import multiprocessing
+import numpy as np
+import os
+import shutil
 import sys
-import math
-from collections import OrderedDict
-import operator
+import tempfile
+from cooccurrence import build_incidence, count_pairs, pmi
+from cooccurrence import get_association_measures, get_top_pairs
+from cooccurrence import ASSOCIATION_MEASURES
+from cooccurrence import (count_pairs_chunked, get_block_size, merge_all_runs,
+    read_run, split_pair_keys, RunWriter)
+from pair_sketch import count_pairs_exactly, sketch_pairs
+from scipy import sparse
+from significance import benjamini_hochberg, benjamini_hochberg_chunked
+from significance import get_log_factorials, hypergeometric_sf
+from significance import permutation_p_values
+from visit_table import load_visit_table
 
 ### This script goes through the original data, and for each herb, symptom pair
-### we compute mutual information (or some other similarity score).
+### we compute mutual information (or some other similarity score). Pairs are
+### counted as a sparse product of the visit by word incidence matrix. Given a
+### memory budget in megabytes, pairs are instead counted in chunks of visits
+### and merged on disk, for data whose pairs do not fit in memory. The top
+### mode scores herb-symptom pairs by every association measure from a single
+### counting pass, and writes each herb's and each symptom's top k partners.
+### Every pair is written with its hypergeometric p-value and its
+### Benjamini-Hochberg q-value. The approx mode finds the most frequent
+### herb-symptom pairs in one pass with a bounded-memory sketch.
 
 # Number of most frequent herbs and symptoms to check.
 NUM_HERBS = 600
 NUM_SYMPTOMS = 4000
+# By default, the approximate mode keeps this many times k pairs.
+SKETCH_FACTOR = 10
 
-# Pointwise mutual information.
-def pmi(c_12, c_1, c_2, N):
-    # N is the number of bigram herb-symptom pairs.
-    # c_12 is C(w_1, w_2), c_1 = C(w_1), c_2 = C(w_2)
-    if c_12 == 0:
-        return float('-inf')
-    return math.log(c_12, 2) + math.log(N, 2) - math.log(c_1, 2) - math.log(c_2, 2)
+class StomachWords(object):
+    '''
+    The words of the HIS stomach disease visits that have both symptoms and
+    herbs. Word ids index into word_list, and the symptom and herb counts and
+    the number of visits N are filled in as the baskets are read, and are
+    counted again on every pass. Word ids stay the same across passes.
+    '''
+    def __init__(self):
+        self.symptom_count_dct, self.herb_count_dct = {}, {}
+        self.word_dct, self.word_list = {}, []
+        self.N = 0
+
+    def iter_visits(self):
+        '''
+        Yields the (symptom ids, herb ids) of every visit with symptoms and
+        herbs. Each list has no repeated ids.
+        '''
+        self.symptom_count_dct, self.herb_count_dct = {}, {}
+        self.N = 0
+        for ((name, birthday), visit_date, diseases, patient_symptoms,
+            patient_herbs) in load_visit_table().iter_visits():
+            # if disease not in disease_label_list[i]:
+            #     continue
+            patient_symptoms = list(set(patient_symptoms))
+            patient_herbs = list(set(patient_herbs))
+            if patient_symptoms == [] or patient_herbs == []:
+                continue
+
+            # Add to the master lists of symptoms and herbs.
+            for symptom in patient_symptoms:
+                if symptom not in self.symptom_count_dct:
+                    self.symptom_count_dct[symptom] = 1
+                else:
+                    self.symptom_count_dct[symptom] += 1
+
+            for herb in patient_herbs:
+                # Update counts.
+                if herb not in self.herb_count_dct:
+                    self.herb_count_dct[herb] = 1
+                else:
+                    self.herb_count_dct[herb] += 1
+
+            self.N += 1
+            yield (self.get_word_ids(patient_symptoms), self.get_word_ids(
+                patient_herbs))
+
+    def get_word_ids(self, words):
+        word_ids = []
+        for word in words:
+            if word not in self.word_dct:
+                self.word_dct[word] = len(self.word_list)
+                self.word_list += [word]
+            word_ids += [self.word_dct[word]]
+        return word_ids
+
+    def iter_baskets(self):
+        '''
+        Yields the list of word ids of every visit with symptoms and herbs.
+        '''
+        for symptom_ids, herb_ids in self.iter_visits():
+            yield symptom_ids + herb_ids
+
+    def iter_herb_symptom_pairs(self):
+        '''
+        Yields the (herb ids, symptom ids, None) batch of every visit's
+        herb-symptom pairs, for pair_sketch.py. Each pair counts once.
+        '''
+        for symptom_ids, herb_ids in self.iter_visits():
+            herbs = np.repeat(herb_ids, len(symptom_ids))
+            symptoms = np.tile(symptom_ids, len(herb_ids))
+            # A word can be both a herb and a symptom, but not pair with itself.
+            distinct = herbs != symptoms
+            yield herbs[distinct], symptoms[distinct], None
+
+    def get_word_counts(self):
+        # Herb counts take precedence for words that are also symptoms.
+        return np.array([self.herb_count_dct[word] if (
+            word in self.herb_count_dct) else self.symptom_count_dct[word] for (
+            word) in self.word_list], dtype=np.int64)
 
 def read_stomach_data():
     '''
-    This function reads the HIS stomach disease data, and forms a patient 
-    dictionary where keys are patient ID's (line numbers) and values are lists
-    of symptoms, herbs, or both, depending on the vector_type input.
+    This function reads the HIS stomach disease data, and returns its words
+    and the visit by word incidence matrix.
+    '''
+    words = StomachWords()
+    baskets = list(words.iter_baskets())
+    # Co-occurrence counts are the off-diagonal entries of X^T X.
+    incidence = build_incidence(baskets, len(words.word_list))
+    return words, incidence
+
+def get_sim_scores(method, N_AB, N_A, N_B, N):
+    if method == 'pmi':
+        num_pairs = NUM_SYMPTOMS * NUM_HERBS
+        return pmi(N_AB, N_A, N_B, num_pairs)
+    return get_association_measures(N_AB, N_A, N_B, N, [method])[method]
+
+def rank_pairs(method):
+    '''
+    Returns the (word a ids, word b ids, scores, p-values, q-values) of every
+    co-occurring pair, sorted by decreasing score, along with the words.
     '''
-    symptom_count_dct, herb_count_dct = {}, {}
-    cooccurrence_count_dct = {}
-    # This dictionary contains the consolidated visits for any single patient.
-    # Keys are (name, birthday) pairs.
-    N = 0
-    f = open('./data/HIS_tuple_word.txt', 'r')
-    for i, line in enumerate(f):
-        # if disease not in disease_label_list[i]:
-        #     continue
-        (patient_disease, name, birthday, visit_date, patient_symptoms,
-            patient_herbs) = line.strip('\n').split('\t')
-
-        patient_symptoms = list(set(patient_symptoms.strip().split(':')))
-        patient_herbs = list(set(patient_herbs.strip().split(':')))
-        if patient_symptoms == [''] or patient_herbs == ['']:
-            continue
-
-        # Add to the master lists of symptoms and herbs.
-        for symptom in patient_symptoms:
-            if symptom not in symptom_count_dct:
-                symptom_count_dct[symptom] = 1
-            else:
-                symptom_count_dct[symptom] += 1
-
-        for herb in patient_herbs:
-            # Update counts.
-            if herb not in herb_count_dct:
-                herb_count_dct[herb] = 1
-            else:
-                herb_count_dct[herb] += 1
-
-        # Do co-occurrence computations.
-        pair_list = list(itertools.combinations(list(set(patient_symptoms +
-            patient_herbs)), 2))
-        for pair in pair_list:
-            node_a, node_b = pair
-            if pair in cooccurrence_count_dct:
-                cooccurrence_count_dct[pair] += 1
-            elif (node_b, node_a) in cooccurrence_count_dct:
-                cooccurrence_count_dct[(node_b, node_a)] += 1
-            else:
-                cooccurrence_count_dct[pair] = 1
-        N += 1
-    f.close()
-    
-    return symptom_count_dct, herb_count_dct, cooccurrence_count_dct, N
+    words, incidence = read_stomach_data()
+    word_counts = words.get_word_counts()
+    # Compute mutual information between every co-occurring pair at once.
+    node_a, node_b, N_AB = count_pairs(incidence)
+    N_A, N_B = word_counts[node_a], word_counts[node_b]
+    sim_scores = get_sim_scores(method, N_AB, N_A, N_B, words.N)
+    p_values = hypergeometric_sf(N_AB, N_A, N_B, words.N)
+    q_values = benjamini_hochberg(p_values)
+    order = np.argsort(-sim_scores, kind='mergesort')
+    return (words, node_a[order], node_b[order], sim_scores[order],
+        p_values[order], q_values[order])
+
+def write_pair(out, words, a, b, sim_score, p_value, q_value):
+    out.write('%s\t%s\t%f\t%g\t%g\n' % (words.word_list[a],
+        words.word_list[b], sim_score, p_value, q_value))
+
+def rank_pairs_chunked(method, memory_budget, out):
+    '''
+    Writes the pairs to out by decreasing score, within the memory budget in
+    bytes. Pairs are counted in chunks and merged on disk, and then scored a
+    block at a time, and the blocks are sorted on disk by score.
+    '''
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        words = StomachWords()
+        pair_fname = count_pairs_chunked(words.iter_baskets(), memory_budget,
+            tmp_dir)
+        word_counts = words.get_word_counts()
+        log_factorials = get_log_factorials(words.N)
+        pair_keys, pair_counts = read_run(pair_fname)
+        block_size = get_block_size(memory_budget)
+        if len(pair_keys) > 0:
+            p_values = np.memmap(os.path.join(tmp_dir, 'p_values.bin'),
+                dtype=np.float64, mode='w+', shape=(len(pair_keys),))
+        score_fnames = []
+        for start in range(0, len(pair_keys), block_size):
+            node_a, node_b = split_pair_keys(pair_keys[start:start +
+                block_size])
+            N_AB = np.array(pair_counts[start:start + block_size])
+            N_A, N_B = word_counts[node_a], word_counts[node_b]
+            sim_scores = get_sim_scores(method, N_AB, N_A, N_B, words.N)
+            p_values[start:start + block_size] = hypergeometric_sf(N_AB, N_A,
+                N_B, words.N, log_factorials)
+            # Runs are sorted by negative score, with the pair's position.
+            order = np.argsort(-sim_scores, kind='mergesort')
+            fname = os.path.join(tmp_dir, 'scores_%d' % len(score_fnames))
+            writer = RunWriter(fname, np.float64)
+            writer.write(-sim_scores[order], start + order)
+            writer.close()
+            score_fnames += [fname]
+        if len(pair_keys) > 0:
+            q_values = benjamini_hochberg_chunked(p_values, tmp_dir,
+                memory_budget)
+        score_fname = merge_all_runs(score_fnames, os.path.join(tmp_dir,
+            'scores'), memory_budget, np.float64)
+        neg_scores, positions = read_run(score_fname, np.float64)
+        for start in range(0, len(positions), block_size):
+            block_positions = np.array(positions[start:start + block_size])
+            node_a, node_b = split_pair_keys(pair_keys[block_positions])
+            for a, b, neg_score, p_value, q_value in zip(node_a.tolist(),
+                node_b.tolist(), neg_scores[start:start + block_size].tolist(),
+                p_values[block_positions].tolist(),
+                q_values[block_positions].tolist()):
+                write_pair(out, words, a, b, -neg_score, p_value, q_value)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+def write_top_pairs(k, num_permutations=0):
+    '''
+    Scores every herb-symptom pair by every association measure, and writes
+    the top k symptoms of each herb and the top k herbs of each symptom. The
+    p-values are hypergeometric, or come from shuffling the herbs of the
+    visits num_permutations times if it is positive.
+    '''
+    words, incidence = read_stomach_data()
+    word_counts = words.get_word_counts()
+    node_a, node_b, N_AB = count_pairs(incidence)
+    # Words that are both herbs and symptoms count as herbs, as in the counts.
+    is_herb = np.array([word in words.herb_count_dct for word in (
+        words.word_list)], dtype=bool)
+    herb_symptom = is_herb[node_a] != is_herb[node_b]
+    node_a, node_b, N_AB = (node_a[herb_symptom], node_b[herb_symptom],
+        N_AB[herb_symptom])
+    herbs = np.where(is_herb[node_a], node_a, node_b)
+    symptoms = np.where(is_herb[node_a], node_b, node_a)
+    score_dct = get_association_measures(N_AB, word_counts[herbs],
+        word_counts[symptoms], words.N)
+    if num_permutations > 0:
+        # Keep only the herb columns on one side and symptoms on the other.
+        herb_incidence = incidence * sparse.diags(is_herb.astype(np.int32))
+        symptom_incidence = incidence * sparse.diags((~is_herb).astype(
+            np.int32))
+        p_values = permutation_p_values(herb_incidence.tocsr(),
+            symptom_incidence.tocsr(), herbs, symptoms, num_permutations,
+            multiprocessing.cpu_count())
+    else:
+        p_values = hypergeometric_sf(N_AB, word_counts[herbs],
+            word_counts[symptoms], words.N)
+    q_values = benjamini_hochberg(p_values)
+
+    for method in ASSOCIATION_MEASURES:
+        for name, items, partners in [('herb', herbs, symptoms), ('symptom',
+            symptoms, herbs)]:
+            top_dct = get_top_pairs(items, score_dct[method], k)
+            out = open('./results/HIS_%s_top_%s.txt' % (name, method), 'w')
+            for item in sorted(top_dct):
+                for i in top_dct[item].tolist():
+                    write_pair(out, words, item, partners[i], score_dct[
+                        method][i], p_values[i], q_values[i])
+            out.close()
+
+def write_approximate_pairs(k, capacity, verify):
+    '''
+    Finds the k most frequent herb-symptom pairs in one pass with a pair
+    sketch of the given capacity, and writes their estimated counts with
+    lower and upper bounds, and whether each pair is certainly in the top k.
+    Warns if the error bound does not separate the top k, as pairs of the top
+    k may then be missing. If verify is True, the pairs in the sketch are
+    counted exactly in a second pass, and the k with the largest exact counts
+    are written.
+    '''
+    words = StomachWords()
+    sketch = sketch_pairs(words.iter_herb_symptom_pairs(), capacity)
+    space_saving_error, count_min_error = sketch.get_error_bounds()
+    print 'Space-Saving counts are at most %g too high' % space_saving_error
+    print 'Count-Min counts are at most %g too high with probability %g' % (
+        count_min_error, 1 - sketch.count_min.delta)
+    separated = sketch.separates_top(k)
+    if not separated:
+        print ('Warning: pairs with counts up to %d may be missing from the '
+            'sketch, so the top %d may be incomplete. Use a larger capacity.' %
+            (space_saving_error, k))
+
+    if verify:
+        # Word ids are assigned in the same order on every pass.
+        herbs, symptoms, estimates, lower_bounds = sketch.get_top(capacity)
+        exact_counts = count_pairs_exactly(words.iter_herb_symptom_pairs(),
+            herbs, symptoms)
+        print '%d of %d estimates are exact' % (np.sum(exact_counts ==
+            estimates), len(estimates))
+        order = np.argsort(-exact_counts, kind='mergesort')[:k]
+        columns = [herbs[order].tolist(), symptoms[order].tolist(), estimates[
+            order].tolist(), lower_bounds[order].tolist(), exact_counts[
+            order].tolist()]
+        header = 'herb\tsymptom\testimate\tlower_bound\texact'
+    else:
+        herbs, symptoms, estimates, lower_bounds = sketch.get_top(k)
+        # Pairs whose lower bound reaches every other pair's upper bound.
+        certain = lower_bounds >= sketch.get_threshold(estimates)
+        print '%d of %d pairs are certainly in the top %d' % (np.sum(certain),
+            len(certain), k)
+        columns = [herbs.tolist(), symptoms.tolist(), estimates.tolist(),
+            lower_bounds.tolist(), certain.astype(int).tolist()]
+        header = 'herb\tsymptom\testimate\tlower_bound\tcertain'
+    out = open('./results/HIS_herb_symp_approx.txt', 'w')
+    out.write(header + '\n')
+    for row in zip(*columns):
+        out.write('\t'.join([words.word_list[row[0]], words.word_list[row[1]]] +
+            map(str, row[2:])) + '\n')
+    out.close()
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print 'Usage: %s mi' % sys.argv[0]
+    methods = ['pmi'] + ASSOCIATION_MEASURES
+    if len(sys.argv) in [3, 4] and sys.argv[1] == 'top':
+        num_permutations = 0
+        if len(sys.argv) == 4:
+            num_permutations = int(sys.argv[3])
+        write_top_pairs(int(sys.argv[2]), num_permutations)
+        exit()
+    if len(sys.argv) in [3, 4, 5] and sys.argv[1] == 'approx':
+        k = int(sys.argv[2])
+        verify = sys.argv[-1] == 'verify'
+        capacity = SKETCH_FACTOR * k
+        if len(sys.argv) - verify == 4:
+            capacity = int(sys.argv[3])
+        write_approximate_pairs(k, capacity, verify)
+        exit()
+    if len(sys.argv) not in [2, 3] or sys.argv[1] not in methods:
+        print 'Usage: %s %s [memory_mb]' % (sys.argv[0], '/'.join(methods))
+        print '       %s top k [num_permutations]' % sys.argv[0]
+        print '       %s approx k [capacity] [verify]' % sys.argv[0]
         exit()
     method = sys.argv[1]
 
-    (symptom_count_dct, herb_count_dct, cooccurrence_count_dct,
-        N) = read_stomach_data()
-
-    # Compute mutual information between every herb-symptom pair.
-    herb_symp_sim_dct = {}
-    num_pairs = NUM_SYMPTOMS * NUM_HERBS
-
-    for (node_a, node_b) in cooccurrence_count_dct:
-        if node_a in herb_count_dct:
-            N_A = herb_count_dct[node_a]
-        else:
-            N_A = symptom_count_dct[node_a]
-
-        if node_b in herb_count_dct:
-            N_B = herb_count_dct[node_b]
-        else:
-            N_B = symptom_count_dct[node_b]
-
-        # Count how many visits a symptom and herb appear together.
-        if (node_a, node_b) in cooccurrence_count_dct:
-            N_AB = cooccurrence_count_dct[(node_a, node_b)]
-        elif (node_b, node_a) in cooccurrence_count_dct:
-            N_AB = cooccurrence_count_dct[(node_b, node_a)]            
-        else:
-            N_AB = 0
-
-        if method == 'pmi':
-            sim_score = pmi(N_AB, N_A, N_B, num_pairs)
-        elif method == 'mi':
-            # Compute the four combinations.
-            # p(A=1, B=1)
-            p_11 = (N_AB + 0.25) / (N + 1)
-            p_A1 = (N_A + 0.5) / (N + 1)
-            p_B1 = (N_B + 0.5) / (N + 1)
-            sim_score = p_11 * math.log(p_11 / p_A1 / p_B1, 2)
-            # p(A=1, B=0)
-            p_10 = (N_A - N_AB + 0.25) / (N + 1)
-            p_B0 = 1 - p_B1
-            sim_score += p_10 * math.log(p_10 / p_A1 / p_B0, 2)
-            # p(A=0, B=1)
-            p_01 = (N_B - N_AB + 0.25) / (N + 1)
-            p_A0 = 1 - p_A1
-            sim_score += p_01 * math.log(p_01 / p_A0 / p_B1, 2)
-            # p(A=0, B=0)
-            p_00 = (N - N_A - N_B + N_AB + 0.25) / (N + 1)
-            sim_score += p_00 * math.log(p_00 / p_A0 / p_B0, 2)
-        herb_symp_sim_dct[(node_a, node_b)] = sim_score
-
-    hssd = sorted(herb_symp_sim_dct.items(), key=lambda x: x[1], reverse=True)
-    
     out = open('./results/HIS_herb_symp_%s.txt' % method, 'w')
-    for (node_a, node_b), sim_score in hssd:
-        out.write('%s\t%s\t%f\n' % (node_a, node_b, sim_score))
-    out.close()
\ No newline at end of file
+    if len(sys.argv) == 3:
+        # Count pairs out of core, within the given memory budget.
+        rank_pairs_chunked(method, int(float(sys.argv[2]) * 2 ** 20), out)
+    else:
+        ranked = rank_pairs(method)
+        words = ranked[0]
+        for pair in zip(*[array.tolist() for array in ranked[1:]]):
+            write_pair(out, words, *pair)
+    out.close()
@@ -12,6 +12,7 @@ from sklearn.cluster import AgglomerativeClustering
 from sklearn.metrics.cluster import adjusted_rand_score
 import sys
 import time
+from visit_table import load_visit_table
 
 ### This script clusters on the HIS stomach data, and finds subcategories.
 ### Run time: 50 minutes.
@@ -32,17 +33,13 @@ def read_stomach_data(vector_type):
     # Values are 2-element lists, first element=symptoms, second=herbs.
     merged_patient_dct = {}
 
-    f = open('./data/HIS_tuple_word.txt', 'r')
-    for i, line in enumerate(f):
+    for ((name, birthday), visit_date, diseases, patient_symptoms,
+        patient_herbs) in load_visit_table().iter_visits():
         # if disease not in disease_label_list[i]:
         #     continue
-        (patient_disease, name, birthday, visit_date, patient_symptoms,
-            patient_herbs) = line.strip('\n').split('\t')
-
-        patient_symptoms = patient_symptoms.strip().split(':')
-        patient_herbs = patient_herbs.strip().split(':')
+        patient_disease = ''.join(label + ':' for label in diseases)
 
-        if patient_symptoms == [''] or patient_herbs == ['']:
+        if patient_symptoms == [] or patient_herbs == []:
             continue
 
         # Merge in a patient if he is already in the dictionary.
@@ -78,8 +75,6 @@ def read_stomach_data(vector_type):
         patient_list += [patient_symptoms + patient_herbs]
         patient_dnb_list += [(patient_disease, name, birthday)]
 
-    f.close()
-
     # Sanity checks.
     if vector_type == 'symptoms':
         assert herb_count_dct == {}
@@ -0,0 +1,157 @@
+### Author: Edward Huang
+
+import multiprocessing
+import numpy as np
+import os
+from cooccurrence import get_block_size, merge_all_runs, read_run, RunWriter
+
+### This module computes the significance of item pairs. The p-value of a pair
+### that appears together k times is the hypergeometric upper tail P(X >= k),
+### computed for all pairs at once from a table of log factorials, instead of
+### one Fisher's exact test at a time. p-values are corrected for multiple
+### testing with the Benjamini-Hochberg procedure. Permutation p-values shuffle
+### one side of the pairs across visits in a pool of processes.
+
+def get_log_factorials(n):
+    '''
+    Returns the table of log(i!) for i from 0 to n.
+    '''
+    log_factorials = np.zeros(n + 1)
+    np.cumsum(np.log(np.arange(1, n + 1)), out=log_factorials[1:])
+    return log_factorials
+
+def _get_log_pmf(x, N_A, N_B, N, log_factorials):
+    # log of C(N_A, x) C(N - N_A, N_B - x) / C(N, N_B).
+    lf = log_factorials
+    return (lf[N_A] - lf[x] - lf[N_A - x] + lf[N - N_A] - lf[N_B - x] -
+        lf[N - N_A - N_B + x] - lf[N] + lf[N_B] + lf[N - N_B])
+
+def hypergeometric_sf(k, N_A, N_B, N, log_factorials=None, tol=1e-16):
+    '''
+    Returns P(X >= k) for every pair, where X is the number of visits with
+    both items when N_B of the N visits are drawn at random and N_A visits
+    have the first item. Terms are summed away from the mode, where they
+    shrink, and a pair stops once its terms fall below tol of its sum. Tails
+    that contain the mode are one minus the opposite tail.
+    '''
+    k, N_A, N_B = [np.array(c, dtype=np.int64) for c in (k, N_A, N_B)]
+    if log_factorials is None:
+        log_factorials = get_log_factorials(N)
+    mode = (N_A + 1) * (N_B + 1) / (N + 2)
+    upward = k > mode
+    x = np.where(upward, k, k - 1)
+    stop = np.where(upward, np.minimum(N_A, N_B), np.maximum(0, N_A + N_B -
+        N))
+    step = np.where(upward, 1, -1)
+    tail = np.zeros(len(k))
+    active = np.where(upward, x <= stop, x >= stop)
+    while active.any():
+        idx = np.flatnonzero(active)
+        term = np.exp(_get_log_pmf(x[idx], N_A[idx], N_B[idx], N,
+            log_factorials))
+        tail[idx] += term
+        x[idx] += step[idx]
+        active[idx] = (np.where(upward[idx], x[idx] <= stop[idx], x[idx] >=
+            stop[idx]) & (term > tol * tail[idx]))
+    return np.clip(np.where(upward, tail, 1 - tail), 0, 1)
+
+def benjamini_hochberg(p_values):
+    '''
+    Returns the Benjamini-Hochberg q-value of every p-value, the smallest
+    false discovery rate at which it is significant.
+    '''
+    p_values = np.asarray(p_values, dtype=np.float64)
+    m = len(p_values)
+    order = np.argsort(p_values, kind='mergesort')
+    q_values = p_values[order] * m / np.arange(1, m + 1)
+    # Each q-value is the smallest adjusted p-value at its rank or later.
+    q_values = np.minimum.accumulate(q_values[::-1])[::-1]
+    result = np.empty(m)
+    result[order] = np.minimum(q_values, 1)
+    return result
+
+def benjamini_hochberg_chunked(p_values, tmp_dir, memory_budget):
+    '''
+    Benjamini-Hochberg q-values of p-values that may be a memory map, within
+    the memory budget in bytes. The p-values are sorted on disk in runs, and
+    the q-values are filled in from the largest p-value down, a block at a
+    time. Returns the q-values as a memory map in tmp_dir.
+    '''
+    m = len(p_values)
+    if m == 0:
+        return np.zeros(0)
+    block_size = get_block_size(memory_budget)
+    fnames = []
+    for start in range(0, m, block_size):
+        block = np.array(p_values[start:start + block_size])
+        order = np.argsort(block, kind='mergesort')
+        fname = os.path.join(tmp_dir, 'p_values_%d' % len(fnames))
+        writer = RunWriter(fname, np.float64)
+        writer.write(block[order], start + order)
+        writer.close()
+        fnames += [fname]
+    sorted_p_values, positions = read_run(merge_all_runs(fnames,
+        os.path.join(tmp_dir, 'p_values'), memory_budget, np.float64),
+        np.float64)
+    q_values = np.memmap(os.path.join(tmp_dir, 'q_values.bin'),
+        dtype=np.float64, mode='w+', shape=(m,))
+    # The smallest adjusted p-value of the ranks after the current block.
+    later_min = 1.0
+    for end in range(m, 0, -block_size):
+        start = max(0, end - block_size)
+        block = sorted_p_values[start:end] * m / np.arange(start + 1, end + 1)
+        block = np.minimum(np.minimum.accumulate(block[::-1])[::-1],
+            later_min)
+        later_min = block[0]
+        q_values[np.array(positions[start:end])] = block
+    return q_values
+
+# The matrices of a worker process, set once by the pool initializer.
+worker_args = None
+
+def init_worker(row_incidence, col_incidence, rows, cols, observed):
+    global worker_args
+    worker_args = (row_incidence, col_incidence, rows, cols, observed)
+
+def count_exceeding(task):
+    '''
+    Shuffles the rows of the row incidence matrix num_permutations times, and
+    counts how often each pair's co-occurrence reaches its observed count.
+    '''
+    seed, num_permutations = task
+    row_incidence, col_incidence, rows, cols, observed = worker_args
+    rng = np.random.RandomState(seed)
+    exceeding = np.zeros(len(observed), dtype=np.int64)
+    for i in range(num_permutations):
+        permuted = row_incidence[rng.permutation(row_incidence.shape[0])]
+        counts = (permuted.T.tocsr() * col_incidence)[rows, cols]
+        exceeding += np.asarray(counts).ravel() >= observed
+    return exceeding
+
+def permutation_p_values(row_incidence, col_incidence, rows, cols,
+    num_permutations, num_processes=1, seed=0):
+    '''
+    Returns the permutation p-value of each (row item, column item) pair,
+    where both incidence matrices are visits by items. The null shuffles the
+    visits of the row items, which keeps every item's count. The p-value is
+    (1 + number of permutations at or above the observed count) / (1 +
+    num_permutations).
+    '''
+    observed = np.asarray((row_incidence.T.tocsr() * col_incidence)[rows,
+        cols]).ravel()
+    args = (row_incidence, col_incidence, rows, cols, observed)
+    # Split the permutations into one batch per process, each with its seed.
+    batch_sizes = [num_permutations / num_processes + (i < num_permutations %
+        num_processes) for i in range(num_processes)]
+    tasks = [(seed + i, batch_size) for i, batch_size in enumerate(
+        batch_sizes) if batch_size > 0]
+    if num_processes == 1:
+        init_worker(*args)
+        results = map(count_exceeding, tasks)
+    else:
+        pool = multiprocessing.Pool(num_processes, init_worker, args)
+        results = pool.map(count_exceeding, tasks)
+        pool.close()
+        pool.join()
+    exceeding = np.sum(results, axis=0)
+    return (1.0 + exceeding) / (1.0 + num_permutations)
@@ -12,6 +12,7 @@ from sklearn.cluster import AgglomerativeClustering
 from sklearn.metrics.cluster import adjusted_rand_score
 import sys
 import time
+from visit_table import load_visit_table
 
 ### This script clusters on the HIS stomach data, and finds subcategories.
 ### Run time: 50 minutes.
@@ -32,31 +33,25 @@ def read_stomach_data(vector_type, disease):
     # Values are 2-element lists, first element=symptoms, second=herbs.
     merged_patient_dct = {}
 
-    f = open('./data/HIS_tuple_word.txt', 'r')
-    for i, line in enumerate(f):
+    for ((name, birthday), visit_date, diseases, patient_symptoms,
+        patient_herbs) in load_visit_table().iter_visits():
         # if disease not in disease_label_list[i]:
         #     continue
-        (patient_disease, name, birthday, visit_date, patient_symptoms,
-            patient_herbs) = line.strip('\n').split('\t')
-        # patient_symptoms, patient_herbs = line.strip().split('\t')
+        patient_disease = ''.join(label + ':' for label in diseases)
         if disease not in patient_disease:
             continue
 
         # Add symptoms and herbs based on the keyword.
         if vector_type == 'symptoms':
-            patient_symptoms = patient_symptoms.strip().split(':')
             patient_herbs = []
-            if patient_symptoms == ['']:
+            if patient_symptoms == []:
                 continue
         elif vector_type == 'herbs':
             patient_symptoms = []
-            patient_herbs = patient_herbs.strip().split(':')
-            if patient_herbs == ['']:
+            if patient_herbs == []:
                 continue
         elif vector_type == 'both':
-            patient_symptoms = patient_symptoms.strip().split(':')
-            patient_herbs = patient_herbs.strip().split(':')
-            if patient_symptoms == [''] or patient_herbs == ['']:
+            if patient_symptoms == [] or patient_herbs == []:
                 continue
 
         # Merge in a patient if he is already in the dictionary.
@@ -90,8 +85,6 @@ def read_stomach_data(vector_type, disease):
         patient_list += [patient_symptoms + patient_herbs]
         patient_dnd_list += [(patient_disease, name, birthday)]
 
-    f.close()
-
     # Sanity checks.
     if vector_type == 'symptoms':
         assert herb_count_dct == {}
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+### Author: Edward Huang
+
+from inverted_index import InvertedIndex, intersect
+import numpy as np
+import os
+import sys
+import time
+
+# The ZRS vocabulary is in the parent directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import zrs_vocabulary
+
+### This module answers exact support queries for arbitrary itemsets, without
+### mining. The support of an itemset is the length of the intersection of its
+### items' posting lists. A batch of itemsets is sorted so that itemsets with a
+### common prefix are next to each other, and the intersections of the prefix
+### are kept on a stack and shared. Running the script reads one itemset per
+### line (comma-separated herbs and symptoms, or ZRS symptoms and drugs) and
+### writes each line's support before it.
+
+# The ZRS data is in the parent directory.
+ZRS_VOCAB_FNAME = '../data/ZRS_vocabulary.txt'
+ZRS_TRANSACTION_FNAME = '../data/ZRS_transactions.txt'
+
+class SupportOracle(object):
+    '''
+    Computes itemset supports from posting lists. get_postings returns the
+    sorted transaction ids of an item id, and item_index_dct maps words to
+    item ids.
+    '''
+    def __init__(self, get_postings, item_index_dct, num_transactions):
+        self.get_postings = get_postings
+        self.item_index_dct = item_index_dct
+        self.num_transactions = num_transactions
+        # Decoded posting lists, by item id.
+        self.postings_dct = {}
+
+    def get_item_postings(self, item):
+        if item not in self.postings_dct:
+            self.postings_dct[item] = self.get_postings(item)
+        return self.postings_dct[item]
+
+    def get_supports(self, itemsets):
+        '''
+        Returns the support of each itemset, in order. Items can be words or
+        item ids, and an itemset with a word not in the vocabulary has support
+        0. Items are intersected from the rarest up, so intermediate results
+        stay small.
+        '''
+        supports = [0] * len(itemsets)
+        keys = []
+        for i, itemset in enumerate(itemsets):
+            items = set([])
+            for item in itemset:
+                if isinstance(item, str):
+                    item = self.item_index_dct.get(item)
+                items.add(item)
+            if None in items:
+                continue
+            keys += [(tuple(sorted(items, key=lambda item: (len(
+                self.get_item_postings(item)), item))), i)]
+        keys.sort()
+
+        # stack[j] holds the transaction ids of the first j + 1 items.
+        stack_items, stack = [], []
+        for items, i in keys:
+            common = 0
+            while common < min(len(items), len(stack_items)) and (
+                items[common] == stack_items[common]):
+                common += 1
+            del stack_items[common:], stack[common:]
+            for item in items[common:]:
+                postings = self.get_item_postings(item)
+                stack += [postings if len(stack) == 0 else intersect(stack[-1],
+                    postings)]
+                stack_items += [item]
+            if len(items) == 0:
+                supports[i] = self.num_transactions
+            else:
+                supports[i] = len(stack[-1])
+        return supports
+
+def get_HIS_oracle():
+    index = InvertedIndex()
+    return SupportOracle(index.get_postings, index.item_index_dct,
+        index.num_visits)
+
+def get_ZRS_oracle(vocab_fname=ZRS_VOCAB_FNAME,
+    fname=ZRS_TRANSACTION_FNAME):
+    '''
+    Builds the posting lists from the ZRS transactions. Visits without both a
+    symptom and a drug are skipped, as in mine_ZRS_frequent_patterns.py.
+    '''
+    vocabulary, term_to_id = zrs_vocabulary.read_vocabulary(vocab_fname)
+    tids_dct = {}
+    num_transactions = 0
+    for visit_no, symptoms, drugs in zrs_vocabulary.read_transactions(fname):
+        if len(symptoms) == 0 or len(drugs) == 0:
+            continue
+        for item in set(symptoms + drugs):
+            tids_dct.setdefault(item, []).append(num_transactions)
+        num_transactions += 1
+    empty = np.zeros(0, dtype=np.int64)
+    get_postings = lambda item: np.array(tids_dct[item], dtype=np.int64) if (
+        item in tids_dct) else empty
+    return SupportOracle(get_postings, term_to_id, num_transactions)
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] not in ['HIS', 'ZRS']:
+        print 'Usage: %s HIS/ZRS itemset_file' % sys.argv[0]
+        exit()
+    if sys.argv[1] == 'HIS':
+        oracle = get_HIS_oracle()
+    else:
+        oracle = get_ZRS_oracle()
+
+    lines = []
+    f = open(sys.argv[2], 'r')
+    for line in f:
+        lines += [line.strip()]
+    f.close()
+    itemsets = [[item.strip() for item in line.split(',') if (
+        item.strip() != '')] for line in lines]
+    for line, support in zip(lines, oracle.get_supports(itemsets)):
+        print '%d\t%s' % (support, line)
+
+if __name__ == '__main__':
+    start_time = time.time()
+    main()
+    print "---%f seconds---" % (time.time() - start_time)
@@ -0,0 +1,46 @@
+### Author: Edward Huang
+
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+from inverted_index import decode_postings, encode_postings, InvertedIndex
+from inverted_index import write_index
+from transaction_store import TransactionStore, write_store
+
+### Tests the inverted index on a small store. Run with
+### python -m unittest test_inverted_index from this directory.
+
+class InvertedIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        store_prefix = os.path.join(self.tmp_dir, 'store')
+        index_prefix = os.path.join(self.tmp_dir, 'index')
+        # The first transaction repeats herb b.
+        write_store([[0, 1, 1], [1, 2], [0, 1]], [('a', 'herb'), ('b',
+            'herb'), ('c', 'symptom')], store_prefix)
+        write_index(TransactionStore(store_prefix), index_prefix)
+        self.index = InvertedIndex(index_prefix, store_prefix)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_postings_round_trip(self):
+        tids = np.array([0, 3, 200, 70000, 2 ** 40])
+        self.assertEqual(decode_postings(encode_postings(tids)).tolist(),
+            tids.tolist())
+
+    def test_repeated_item(self):
+        self.assertEqual(self.index.get_count('b'), 3)
+        self.assertEqual(self.index.get_postings('b').tolist(), [0, 1, 2])
+        self.assertEqual(self.index.count([['b']]), 3)
+
+    def test_query(self):
+        self.assertEqual(self.index.query([['a'], ['b']]).tolist(), [0, 2])
+        self.assertEqual(self.index.query([['a', 'c']]).tolist(), [0, 1, 2])
+        self.assertEqual(self.index.query([['b']], ['c']).tolist(), [0, 2])
+        self.assertEqual(self.index.count([], ['a']), 1)
+
+if __name__ == '__main__':
+    unittest.main()
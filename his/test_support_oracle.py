@@ -0,0 +1,47 @@
+### Author: Edward Huang
+
+import os
+import shutil
+import tempfile
+import unittest
+from inverted_index import InvertedIndex, write_index
+from support_oracle import SupportOracle
+from transaction_store import TransactionStore, write_store
+
+### Tests the support oracle against the supports counted by hand on a small
+### store. Run with python -m unittest test_support_oracle from this
+### directory.
+
+TRANSACTIONS = [[0, 1, 1], [1, 2], [0, 1], [2, 3, 0]]
+VOCABULARY = [('a', 'herb'), ('b', 'herb'), ('c', 'symptom'), ('d',
+    'symptom')]
+
+class SupportOracleTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        store_prefix = os.path.join(self.tmp_dir, 'store')
+        index_prefix = os.path.join(self.tmp_dir, 'index')
+        write_store(TRANSACTIONS, VOCABULARY, store_prefix)
+        write_index(TransactionStore(store_prefix), index_prefix)
+        index = InvertedIndex(index_prefix, store_prefix)
+        self.oracle = SupportOracle(index.get_postings, index.item_index_dct,
+            index.num_visits)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_repeated_item(self):
+        # The first transaction repeats b, but counts once.
+        self.assertEqual(self.oracle.get_supports([['b'], ['a', 'b']]), [3,
+            2])
+
+    def test_supports(self):
+        itemsets = [['a'], ['a', 'c'], ['c', 'd', 'a'], ['b', 'c'], ['a',
+            'x'], [], [0, 1]]
+        expected = [sum(set(itemset) <= set([VOCABULARY[item][0] for item in (
+            transaction)]) for transaction in TRANSACTIONS) for itemset in (
+            itemsets[:4])] + [0, len(TRANSACTIONS), 2]
+        self.assertEqual(self.oracle.get_supports(itemsets), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+### Author: Edward Huang
+
+import numpy as np
+import sys
+import time
+from topic_loader import load_topics
+
+### This module computes divergences between every herb and every symptom
+### topic distribution: KL-divergence, symmetric KL-divergence, and
+### Jensen-Shannon divergence. Each herb's and symptom's topic probabilities
+### are smoothed and normalized to sum to 1, and the divergences are computed
+### a tile of herbs by symptoms at a time, so that memory stays within
+### MEMORY_BUDGET. KL-divergences come from matrix products of the
+### distributions and their logs. Running the script writes the pairs with the
+### lowest divergences overall, and the symptoms closest to each herb.
+
+TOPIC_NUM = 15
+NUM_TOPICS = 97
+NUM_RESULTS = 1000
+# Number of closest symptoms written for each herb.
+NUM_PER_HERB = 10
+# Added to every topic probability before normalizing.
+SMOOTHING = 1e-05
+# Bytes of memory to use for a tile of divergences.
+MEMORY_BUDGET = 2 ** 28
+# Divergence names, as in the output file names.
+METHODS = ['kl', 'skl', 'js']
+
+def normalize(topic_matrix, smoothing=SMOOTHING):
+    '''
+    Adds smoothing to every probability, and normalizes each row to sum to 1.
+    Divergences are computed in double precision.
+    '''
+    topic_matrix = topic_matrix.astype(np.float64) + smoothing
+    return topic_matrix / topic_matrix.sum(axis=1)[:, np.newaxis]
+
+def get_logs(matrix):
+    # Logs of the probabilities, with 0 for zeros, so that 0 log 0 = 0.
+    return np.log(np.where(matrix > 0, matrix, 1))
+
+def get_kl_divergences(herb_block, symptom_block):
+    '''
+    Returns the herbs by symptoms array of D_KL(symptom || herb), the sum of
+    S(i) * log(S(i) / H(i)) over topics i. This is the symptom's negative
+    entropy minus S . log(H). A topic with zero herb probability but not zero
+    symptom probability makes the divergence infinite.
+    '''
+    neg_entropies = (symptom_block * get_logs(symptom_block)).sum(axis=1)
+    kl_div = neg_entropies[np.newaxis, :] - get_logs(herb_block).dot(
+        symptom_block.T)
+    infinite = (herb_block <= 0).astype(np.float64).dot((symptom_block >
+        0).T) > 0
+    kl_div[infinite] = np.inf
+    return kl_div
+
+def get_symmetric_kl_divergences(herb_block, symptom_block):
+    # D_KL(symptom || herb) + D_KL(herb || symptom).
+    return get_kl_divergences(herb_block, symptom_block) + get_kl_divergences(
+        symptom_block, herb_block).T
+
+def get_js_divergences(herb_block, symptom_block):
+    '''
+    Returns the herbs by symptoms array of Jensen-Shannon divergences, the
+    entropy of the mean distribution M = (H + S) / 2 minus the mean entropy of
+    H and S. M is formed for every pair, so the block takes herbs by symptoms
+    by topics memory.
+    '''
+    herb_entropies = -(herb_block * get_logs(herb_block)).sum(axis=1)
+    symptom_entropies = -(symptom_block * get_logs(symptom_block)).sum(axis=1)
+    mean = (herb_block[:, np.newaxis, :] + symptom_block[np.newaxis, :, :]) / 2
+    mean_entropies = -(mean * get_logs(mean)).sum(axis=2)
+    return mean_entropies - (herb_entropies[:, np.newaxis] +
+        symptom_entropies[np.newaxis, :]) / 2
+
+DIVERGENCE_FUNCTIONS = {'kl' : get_kl_divergences,
+    'skl' : get_symmetric_kl_divergences, 'js' : get_js_divergences}
+
+def get_tile_shape(num_symptoms, num_topics, method,
+    memory_budget=MEMORY_BUDGET):
+    '''
+    Returns the number of herbs and of symptoms in a tile, so that its
+    temporary arrays fit in the memory budget. Jensen-Shannon needs a
+    topic-length vector for every pair of the tile.
+    '''
+    # A few float64 temporaries per entry.
+    entry_bytes = 8 * 4
+    if method == 'js':
+        entry_bytes *= num_topics
+    num_entries = max(1, memory_budget / entry_bytes)
+    tile_symptoms = max(1, min(num_symptoms, num_entries))
+    return max(1, num_entries / tile_symptoms), tile_symptoms
+
+def _merge_smallest(values, indices, new_values, new_indices, k):
+    '''
+    Keeps the k smallest values along the last axis of the concatenation of
+    two (values, indices) pairs of arrays.
+    '''
+    values = np.concatenate((values, new_values), axis=-1)
+    indices = np.concatenate((indices, new_indices), axis=-1)
+    if values.shape[-1] > k:
+        smallest = np.argpartition(values, k - 1, axis=-1)[..., :k]
+        values = np.take_along_axis(values, smallest, axis=-1)
+        indices = np.take_along_axis(indices, smallest, axis=-1)
+    return values, indices
+
+def _sort_smallest(values, indices):
+    order = np.argsort(values, axis=-1, kind='mergesort')
+    return (np.take_along_axis(values, order, axis=-1),
+        np.take_along_axis(indices, order, axis=-1))
+
+def get_closest_pairs(herb_matrix, symptom_matrix, method, num_results,
+    num_per_herb, memory_budget=MEMORY_BUDGET):
+    '''
+    Computes the divergences of every herb and symptom distribution a tile at
+    a time. Returns the (herb indices, symptom indices, divergences) of the
+    num_results closest pairs, and the (symptom indices, divergences) arrays
+    of each herb's num_per_herb closest symptoms, closest first.
+    '''
+    divergence_function = DIVERGENCE_FUNCTIONS[method]
+    num_herbs, num_symptoms = len(herb_matrix), len(symptom_matrix)
+    tile_herbs, tile_symptoms = get_tile_shape(num_symptoms,
+        herb_matrix.shape[1], method, memory_budget)
+    # Global pairs are indexed by herb * num_symptoms + symptom.
+    top_values, top_pairs = np.zeros(0), np.zeros(0, dtype=np.int64)
+    herb_value_blocks, herb_symptom_blocks = [], []
+    for herb_start in range(0, num_herbs, tile_herbs):
+        herb_end = min(num_herbs, herb_start + tile_herbs)
+        block_values = np.zeros((herb_end - herb_start, 0))
+        block_symptoms = np.zeros((herb_end - herb_start, 0), dtype=np.int64)
+        for symptom_start in range(0, num_symptoms, tile_symptoms):
+            symptom_end = min(num_symptoms, symptom_start + tile_symptoms)
+            divergences = divergence_function(herb_matrix[herb_start:herb_end],
+                symptom_matrix[symptom_start:symptom_end])
+            symptoms = np.tile(np.arange(symptom_start, symptom_end), (len(
+                divergences), 1))
+            block_values, block_symptoms = _merge_smallest(block_values,
+                block_symptoms, divergences, symptoms, num_per_herb)
+            pairs = (np.arange(herb_start, herb_end)[:, np.newaxis] *
+                num_symptoms + symptoms)
+            top_values, top_pairs = _merge_smallest(top_values, top_pairs,
+                divergences.ravel(), pairs.ravel(), num_results)
+        herb_value_blocks += [block_values]
+        herb_symptom_blocks += [block_symptoms]
+    top_values, top_pairs = _sort_smallest(top_values, top_pairs)
+    herb_values, herb_symptoms = _sort_smallest(np.concatenate(
+        herb_value_blocks), np.concatenate(herb_symptom_blocks))
+    top_herbs, top_symptoms = np.divmod(top_pairs, num_symptoms)
+    return (top_herbs, top_symptoms, top_values), (herb_symptoms, herb_values)
+
+def main():
+    if len(sys.argv) not in [2, 3, 4] or sys.argv[1] not in METHODS:
+        print 'Usage: %s %s [norm] [smoothing]' % (sys.argv[0], '/'.join(
+            METHODS))
+        exit()
+    method = sys.argv[1]
+    norm = ''
+    smoothing = SMOOTHING
+    for arg in sys.argv[2:]:
+        try:
+            smoothing = float(arg)
+        except ValueError:
+            norm = arg + '_'
+
+    herb_topics = load_topics('./data/%d_%sherb.topic%d' % (NUM_TOPICS, norm,
+        TOPIC_NUM))
+    symp_topics = load_topics('./data/%d_%ssymptom.topic%d' % (NUM_TOPICS,
+        norm, TOPIC_NUM))
+    assert herb_topics.num_topics == symp_topics.num_topics
+    all_herbs, all_symps = herb_topics.words, symp_topics.words
+    (herbs, symps, divergences), (herb_symps, herb_divergences) = (
+        get_closest_pairs(normalize(herb_topics.matrix, smoothing), normalize(
+        symp_topics.matrix, smoothing), method, NUM_RESULTS, NUM_PER_HERB))
+
+    out = open('./results/%d_%s%s.topic%d_%d' % (NUM_TOPICS, norm, method,
+        TOPIC_NUM, NUM_RESULTS), 'w')
+    for herb, symp, divergence in zip(herbs.tolist(), symps.tolist(),
+        divergences.tolist()):
+        out.write('%s\t%s\t%f\n' % (all_herbs[herb], all_symps[symp],
+            divergence))
+    out.close()
+
+    out = open('./results/%d_%s%s_per_herb.topic%d_%d' % (NUM_TOPICS, norm,
+        method, TOPIC_NUM, NUM_PER_HERB), 'w')
+    for herb, symps, divergences in zip(all_herbs, herb_symps.tolist(),
+        herb_divergences.tolist()):
+        for symp, divergence in zip(symps, divergences):
+            out.write('%s\t%s\t%f\n' % (herb, all_symps[symp], divergence))
+    out.close()
+
+if __name__ == '__main__':
+    start_time = time.time()
+    main()
+    print "---%f seconds---" % (time.time() - start_time)
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+### Author: Edward Huang
+
+import numpy as np
+import os
+import sys
+import time
+
+### This module loads topic files into words by topics float32 arrays. .topic
+### files have one line per topic of tab-separated word:probability pairs, and
+### lda-c .beta files have one line per topic of log probabilities, one for
+### each word of a vocabulary file. The number of topics is the number of
+### lines. The arrays and words are cached in .npy files next to the topic
+### file, and are parsed again only when the topic file or the vocabulary is
+### newer than the cache.
+
+class TopicMatrix(object):
+    '''
+    The words of a topic file and their topic probabilities. Row i of matrix
+    belongs to words[i], and word_index maps words back to their rows.
+    '''
+    def __init__(self, words, matrix):
+        self.words = words
+        self.word_index = dict((word, i) for i, word in enumerate(words))
+        self.matrix = matrix
+        self.num_topics = matrix.shape[1]
+
+def parse_topic_file(fname):
+    '''
+    Returns the words, in order of appearance, and the words by topics array
+    of a .topic file. Words missing from a topic get 0, and repeated words in
+    a topic are summed.
+    '''
+    word_dct, word_list = {}, []
+    rows, columns, values = [], [], []
+    f = open(fname, 'r')
+    num_topics = 0
+    for line in f:
+        for pair in line.strip().split('\t'):
+            # Split by colon.
+            word, val = pair.split(':')
+            if word not in word_dct:
+                word_dct[word] = len(word_list)
+                word_list += [word]
+            rows += [word_dct[word]]
+            columns += [num_topics]
+            values += [float(val)]
+        num_topics += 1
+    f.close()
+
+    matrix = np.zeros((len(word_list), num_topics), dtype=np.float32)
+    np.add.at(matrix, (rows, columns), values)
+    return word_list, matrix
+
+def parse_beta_file(fname, vocab_fname=None):
+    '''
+    Returns the words and the words by topics array of probabilities of an
+    lda-c .beta file. Words are the lines of the vocabulary file, or the word
+    ids without one.
+    '''
+    f = open(fname, 'r')
+    lines = [line.split() for line in f if line.strip() != '']
+    f.close()
+    # Each line is a topic's log probability of every word.
+    matrix = np.exp(np.array(lines, dtype=np.float64)).T.astype(np.float32)
+    if vocab_fname is None:
+        word_list = [str(i) for i in range(len(matrix))]
+    else:
+        f = open(vocab_fname, 'r')
+        word_list = [line.strip() for line in f]
+        f.close()
+        assert len(word_list) == len(matrix)
+    return word_list, np.ascontiguousarray(matrix)
+
+def load_topics(fname, vocab_fname=None):
+    '''
+    Returns the TopicMatrix of a .topic or .beta file, from its cache if the
+    cache is newer than the files. The cached array is memory mapped.
+    '''
+    matrix_fname, words_fname = fname + '_matrix.npy', fname + '_words.npy'
+    sources = [fname] + ([vocab_fname] if vocab_fname is not None else [])
+    source_mtime = max(os.path.getmtime(source) for source in sources)
+    if os.path.exists(matrix_fname) and os.path.exists(words_fname) and min(
+        os.path.getmtime(matrix_fname), os.path.getmtime(words_fname)) >= (
+        source_mtime):
+        return TopicMatrix(np.load(words_fname).tolist(), np.load(matrix_fname,
+            mmap_mode='r'))
+    if fname.endswith('.beta'):
+        word_list, matrix = parse_beta_file(fname, vocab_fname)
+    else:
+        word_list, matrix = parse_topic_file(fname)
+    np.save(matrix_fname, matrix)
+    np.save(words_fname, np.array(word_list, dtype=str) if len(word_list) > 0
+        else np.zeros(0, dtype='S1'))
+    return TopicMatrix(word_list, matrix)
+
+def main():
+    if len(sys.argv) not in [2, 3]:
+        print 'Usage: %s topic_file [vocab_file]' % sys.argv[0]
+        exit()
+    topics = load_topics(*sys.argv[1:])
+    print '%d words, %d topics' % (len(topics.words), topics.num_topics)
+
+if __name__ == '__main__':
+    start_time = time.time()
+    main()
+    print "---%f seconds---" % (time.time() - start_time)
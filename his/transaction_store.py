@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+### Author: Edward Huang
+
+import numpy as np
+import time
+
+### This module stores the HIS transactions in a binary, compressed sparse row
+### format: every transaction's item ids, concatenated into one int32 array,
+### and an int64 array of where each transaction starts. An item -> transaction
+### ids view (compressed sparse column) is stored the same way, and a vocabulary
+### file maps each item id to its word and type. The arrays are memory-mapped,
+### so opening the store does not read or parse the transactions. Running the
+### script prints the size of the store.
+
+STORE_PREFIX = './data/HIS_store'
+
+def write_store(transactions, vocabulary, prefix=STORE_PREFIX):
+    '''
+    Writes the transactions (lists of item ids) and the vocabulary (a list of
+    (word, type) pairs indexed by item id) to the files starting with prefix.
+    Each transaction's items are stored once, in increasing order, so a
+    transaction id appears at most once in an item's transaction ids.
+    '''
+    transactions = [sorted(set(transaction)) for transaction in transactions]
+    lengths = np.array([len(transaction) for transaction in transactions],
+        dtype=np.int64)
+    offsets = np.zeros(len(transactions) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    items = np.fromiter((item for transaction in transactions for item in (
+        transaction)), dtype=np.int32, count=offsets[-1])
+    np.save(prefix + '_items.npy', items)
+    np.save(prefix + '_offsets.npy', offsets)
+
+    # Group the transaction ids by item. The sort is stable, so each item's
+    # transaction ids stay in increasing order.
+    tids = np.repeat(np.arange(len(transactions), dtype=np.int32), lengths)
+    order = np.argsort(items, kind='mergesort')
+    item_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(items, minlength=len(vocabulary)),
+        out=item_offsets[1:])
+    np.save(prefix + '_tids.npy', tids[order])
+    np.save(prefix + '_item_offsets.npy', item_offsets)
+
+    out = open(prefix + '_vocabulary.txt', 'w')
+    for item, (word, item_type) in enumerate(vocabulary):
+        out.write('%d\t%s\t%s\n' % (item, word, item_type))
+    out.close()
+
+def read_vocabulary(prefix=STORE_PREFIX):
+    '''
+    Returns the list of (word, type) pairs indexed by item id.
+    '''
+    vocabulary = []
+    f = open(prefix + '_vocabulary.txt', 'r')
+    for line in f:
+        item, word, item_type = line.rstrip('\n').split('\t')
+        assert int(item) == len(vocabulary)
+        vocabulary += [(word, item_type)]
+    f.close()
+    return vocabulary
+
+class TransactionStore(object):
+    '''
+    Read-only view of a store written by write_store. Transactions and item
+    transaction ids are returned as slices of the memory-mapped arrays.
+    '''
+    def __init__(self, prefix=STORE_PREFIX):
+        self.items = np.load(prefix + '_items.npy', mmap_mode='r')
+        self.offsets = np.load(prefix + '_offsets.npy', mmap_mode='r')
+        self.tids = np.load(prefix + '_tids.npy', mmap_mode='r')
+        self.item_offsets = np.load(prefix + '_item_offsets.npy',
+            mmap_mode='r')
+        self.vocabulary = read_vocabulary(prefix)
+        self.num_items = len(self.vocabulary)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get_transaction(self, tid):
+        return self.items[self.offsets[tid]:self.offsets[tid + 1]]
+
+    def get_tids(self, item):
+        '''
+        Returns the sorted ids of the transactions that contain item.
+        '''
+        return self.tids[self.item_offsets[item]:self.item_offsets[item + 1]]
+
+    def get_supports(self):
+        return np.diff(self.item_offsets)
+
+    def get_item_class(self):
+        return [item_type for word, item_type in self.vocabulary]
+
+    def to_lists(self):
+        '''
+        Returns the transactions as lists of integer item ids.
+        '''
+        items = self.items.tolist()
+        offsets = self.offsets.tolist()
+        return [items[offsets[tid]:offsets[tid + 1]] for tid in range(len(
+            self))]
+
+def main():
+    start_time = time.time()
+    store = TransactionStore()
+    print 'Opened the store, took %f seconds.' % (time.time() - start_time)
+    print '%d transactions, %d items, %d item occurrences' % (len(store),
+        store.num_items, len(store.items))
+
+if __name__ == '__main__':
+    start_time = time.time()
+    main()
+    print "---%f seconds---" % (time.time() - start_time)
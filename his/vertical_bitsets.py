@@ -0,0 +1,145 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+### Author: Edward Huang
+
+import numpy as np
+import os
+import sys
+import time
+import transaction_store
+
+# The constraints are shared with the miners in the parent directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from itemset_mining import Constraint
+
+### This module stores the HIS transactions vertically: each item's set of
+### transactions is a packed row of bits in a NumPy array. The support of an
+### itemset is the popcount of the AND of its rows, so Eclat-style mining and
+### ad-hoc support queries run as vectorized array operations. Running the
+### script prints the support of the herbs and symptoms given as arguments.
+
+# Number of set bits in each byte value.
+POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)],
+    dtype=np.uint8)
+# Number of candidate rows ANDed at once while counting supports.
+BLOCK_SIZE = 256
+
+def build_bitsets(transactions, num_items=None):
+    '''
+    Returns a (num_items x num_words) uint64 array, where bit t of row i is set
+    if transaction t contains item i.
+    '''
+    lengths = np.array([len(transaction) for transaction in transactions],
+        dtype=np.int64)
+    items = np.fromiter((item for transaction in transactions for item in (
+        transaction)), dtype=np.int64, count=lengths.sum())
+    tids = np.repeat(np.arange(len(transactions), dtype=np.int64), lengths)
+    if num_items is None:
+        num_items = items.max() + 1 if len(items) > 0 else 0
+    num_words = (len(transactions) + 63) // 64
+    bitsets = np.zeros((num_items, num_words), dtype=np.uint64)
+    np.bitwise_or.at(bitsets, (items, tids >> 6), np.left_shift(np.uint64(1),
+        (tids & 63).astype(np.uint64)))
+    return bitsets
+
+def build_store_bitsets(store):
+    '''
+    Returns the same array as build_bitsets, built from a TransactionStore's
+    item -> transaction ids view without reading the transactions.
+    '''
+    tids = np.asarray(store.tids, dtype=np.int64)
+    items = np.repeat(np.arange(store.num_items, dtype=np.int64),
+        store.get_supports())
+    num_words = (len(store) + 63) // 64
+    bitsets = np.zeros((store.num_items, num_words), dtype=np.uint64)
+    np.bitwise_or.at(bitsets, (items, tids >> 6), np.left_shift(np.uint64(1),
+        (tids & 63).astype(np.uint64)))
+    return bitsets
+
+def popcount(bits):
+    '''
+    Counts the set bits along the last axis of a uint64 array.
+    '''
+    bits = np.ascontiguousarray(bits)
+    byte_view = bits.view(np.uint8).reshape(bits.shape[:-1] + (-1,))
+    return POPCOUNT_TABLE[byte_view].sum(axis=-1, dtype=np.int64)
+
+def get_support(bitsets, itemset):
+    '''
+    Returns the number of transactions that contain every item in itemset.
+    '''
+    itemset = list(itemset)
+    if len(itemset) == 0:
+        return None
+    return int(popcount(np.bitwise_and.reduce(bitsets[itemset], axis=0)))
+
+def get_extension_supports(bitsets, prefix_bits, candidates):
+    '''
+    Returns the support of the prefix extended by each candidate item, ANDing
+    BLOCK_SIZE candidate rows at a time.
+    '''
+    supports = np.empty(len(candidates), dtype=np.int64)
+    for start in range(0, len(candidates), BLOCK_SIZE):
+        block = candidates[start:start + BLOCK_SIZE]
+        supports[start:start + BLOCK_SIZE] = popcount(np.bitwise_and(
+            bitsets[block], prefix_bits))
+    return supports
+
+def _eclat(bitsets, prefix, prefix_bits, candidates, min_support, constraint):
+    supports = get_extension_supports(bitsets, prefix_bits, candidates)
+    frequent = supports >= min_support
+    candidates, supports = candidates[frequent], supports[frequent]
+    for k in range(len(candidates)):
+        new_prefix = prefix + [int(candidates[k])]
+        tail = candidates[k + 1:]
+        if constraint.max_len is not None and len(new_prefix) >= (
+            constraint.max_len):
+            tail = tail[:0]
+        # Prune the branch if nothing in it can satisfy the constraint.
+        if not constraint.may_contain(new_prefix, tail.tolist()):
+            continue
+        if constraint.accepts(new_prefix):
+            yield frozenset(new_prefix), int(supports[k])
+        if len(tail) == 0:
+            continue
+        new_bits = np.bitwise_and(prefix_bits, bitsets[candidates[k]])
+        for pattern in _eclat(bitsets, new_prefix, new_bits, tail,
+            min_support, constraint):
+            yield pattern
+
+def eclat(bitsets, min_support, item_class=None, required_classes=(),
+    min_len=1, max_len=None):
+    '''
+    Mines the frequent itemsets depth-first over the bitsets. Items are
+    extended in order of increasing support, and the supports of all the
+    extensions of a prefix are counted in one vectorized pass. The constraints
+    are the same as in itemset_mining.fpgrowth. Yields each frequent itemset (a
+    frozenset) with its support.
+    '''
+    constraint = Constraint(item_class, required_classes, min_len, max_len)
+    item_supports = popcount(bitsets)
+    items = np.flatnonzero(item_supports >= min_support)
+    items = items[np.argsort(item_supports[items], kind='mergesort')]
+    all_bits = np.empty(bitsets.shape[1], dtype=np.uint64)
+    all_bits.fill(np.iinfo(np.uint64).max)
+    for pattern in _eclat(bitsets, [], all_bits, items, min_support,
+        constraint):
+        yield pattern
+
+def main():
+    if len(sys.argv) < 2:
+        print 'Usage: %s herb_or_symptom [herb_or_symptom ...]' % sys.argv[0]
+        exit()
+    store = transaction_store.TransactionStore()
+    item_index_dct = dict((word, i) for i, (word, item_type) in enumerate(
+        store.vocabulary))
+
+    bitsets = build_store_bitsets(store)
+    itemset = [item_index_dct[item] for item in sys.argv[1:]]
+    print get_support(bitsets, itemset)
+
+if __name__ == '__main__':
+    start_time = time.time()
+    main()
+    print "---%f seconds---" % (time.time() - start_time)
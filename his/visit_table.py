@@ -0,0 +1,178 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+### Author: Edward Huang
+
+import hashlib
+import numpy as np
+import os
+import sys
+import time
+
+### This module parses HIS_tuple_word.txt once into a columnar visit table. Each
+### visit has a patient id (for the (name, date of birth) key) and a diagnosis
+### date, and its diseases, symptoms, and herbs are integer ids stored in
+### compressed sparse rows. The table is cached in an .npz file next to the
+### text file, with the md5 of the text file, and is rebuilt only when the
+### text file hashes differently. Running the script builds the cache and
+### prints the size of the table.
+
+VISIT_FNAME = './data/HIS_tuple_word.txt'
+# The columns of HIS_tuple_word.txt that are lists of words.
+LIST_COLUMNS = ['diseases', 'symptoms', 'herbs']
+
+def get_file_hash(fname):
+    md5 = hashlib.md5()
+    f = open(fname, 'rb')
+    for block in iter(lambda: f.read(1 << 20), ''):
+        md5.update(block)
+    f.close()
+    return md5.hexdigest()
+
+def split_words(field):
+    '''
+    Splits a colon-separated field. Most fields end with a colon, and the
+    empty string after it is dropped. Some symptom fields do not end with a
+    colon, and their last word is kept, although the old get_patient_dct
+    functions dropped it.
+    '''
+    words = field.strip().split(':')
+    if words[-1] == '':
+        words = words[:-1]
+    return words
+
+def get_diagnosis_date(field):
+    # The date follows a comma, e.g. 'xxx，2015-01-01 10:00'.
+    if '，' not in field:
+        return ''
+    return field.split('，')[1][:len('xxxx-xx-xx')]
+
+class VisitTable(object):
+    '''
+    The visits in HIS_tuple_word.txt, in file order. patients[i] indexes into
+    patient_keys, and dates[i] into date_list. For each list column, the word
+    ids of visit i are ids[offsets[i]:offsets[i + 1]], and index into vocab.
+    '''
+    def __init__(self, arrays):
+        self.patient_keys = zip(arrays['names'].tolist(),
+            arrays['dobs'].tolist())
+        self.patients = arrays['patients']
+        self.date_list = arrays['date_list'].tolist()
+        self.dates = arrays['dates']
+        self.columns = {}
+        for column in LIST_COLUMNS:
+            self.columns[column] = (arrays[column + '_offsets'],
+                arrays[column + '_ids'], arrays[column + '_vocab'].tolist())
+
+    def __len__(self):
+        return len(self.patients)
+
+    def get_words(self, column, i):
+        offsets, ids, vocab = self.columns[column]
+        return [vocab[word_id] for word_id in ids[offsets[i]:offsets[
+            i + 1]].tolist()]
+
+    def iter_visits(self):
+        '''
+        Yields the ((name, date of birth), diagnosis date, diseases, symptoms,
+        herbs) tuple of every visit, with the lists as words.
+        '''
+        patients, dates = self.patients.tolist(), self.dates.tolist()
+        decoded = []
+        for column in LIST_COLUMNS:
+            offsets, ids, vocab = self.columns[column]
+            words = [vocab[word_id] for word_id in ids.tolist()]
+            decoded += [(offsets.tolist(), words)]
+        for i in range(len(patients)):
+            visit = [self.patient_keys[patients[i]], self.date_list[dates[i]]]
+            for offsets, words in decoded:
+                visit += [words[offsets[i]:offsets[i + 1]]]
+            yield tuple(visit)
+
+    def get_patient_dct(self):
+        '''
+        Returns a dictionary, where keys are (name, DOB) pairs and values are
+        lists of [diseases, diagnosis date, symptoms, herbs] visits.
+        '''
+        patient_dct = {}
+        for key, date, diseases, symptoms, herbs in self.iter_visits():
+            patient_dct.setdefault(key, []).append([diseases, date, symptoms,
+                herbs])
+        return patient_dct
+
+def parse_visit_file(fname):
+    '''
+    Parses the text file into the arrays of a VisitTable.
+    '''
+    key_dct, date_dct = {}, {}
+    patients, dates = [], []
+    vocab_dcts = dict((column, {}) for column in LIST_COLUMNS)
+    id_lists = dict((column, []) for column in LIST_COLUMNS)
+    lengths = dict((column, []) for column in LIST_COLUMNS)
+    f = open(fname, 'r')
+    for line in f:
+        (diseases, name, dob, diagnosis_date, symptoms, herbs) = line.strip(
+            '\n').split('\t')
+        patients += [key_dct.setdefault((name, dob), len(key_dct))]
+        dates += [date_dct.setdefault(get_diagnosis_date(diagnosis_date),
+            len(date_dct))]
+        for column, field in zip(LIST_COLUMNS, [diseases, symptoms, herbs]):
+            vocab_dct = vocab_dcts[column]
+            words = split_words(field)
+            id_lists[column] += [vocab_dct.setdefault(word, len(vocab_dct))
+                for word in words]
+            lengths[column] += [len(words)]
+    f.close()
+
+    def get_vocab(dct):
+        # Words in id order, as a byte string array.
+        words = sorted(dct, key=dct.get)
+        return np.array(words, dtype=str) if len(words) > 0 else np.zeros(0,
+            dtype='S1')
+
+    keys = sorted(key_dct, key=key_dct.get)
+    arrays = {'names' : np.array([key[0] for key in keys], dtype=str),
+        'dobs' : np.array([key[1] for key in keys], dtype=str),
+        'patients' : np.array(patients, dtype=np.int32),
+        'date_list' : get_vocab(date_dct),
+        'dates' : np.array(dates, dtype=np.int32)}
+    for column in LIST_COLUMNS:
+        offsets = np.zeros(len(patients) + 1, dtype=np.int64)
+        np.cumsum(lengths[column], out=offsets[1:])
+        arrays[column + '_offsets'] = offsets
+        arrays[column + '_ids'] = np.array(id_lists[column], dtype=np.int32)
+        arrays[column + '_vocab'] = get_vocab(vocab_dcts[column])
+    return arrays
+
+def load_visit_table(fname=VISIT_FNAME):
+    '''
+    Returns the VisitTable of the text file, from the cache if it is current.
+    '''
+    cache_fname = os.path.splitext(fname)[0] + '_table.npz'
+    file_hash = get_file_hash(fname)
+    if os.path.exists(cache_fname):
+        arrays = dict(np.load(cache_fname))
+        if str(arrays['source_hash']) == file_hash:
+            return VisitTable(arrays)
+    arrays = parse_visit_file(fname)
+    arrays['source_hash'] = np.array(file_hash)
+    np.savez(cache_fname, **arrays)
+    return VisitTable(arrays)
+
+def main():
+    if len(sys.argv) > 2:
+        print 'Usage: %s [HIS_tuple_word.txt]' % sys.argv[0]
+        exit()
+    fname = VISIT_FNAME
+    if len(sys.argv) == 2:
+        fname = sys.argv[1]
+    table = load_visit_table(fname)
+    print '%d visits, %d patients' % (len(table), len(table.patient_keys))
+    for column in LIST_COLUMNS:
+        offsets, ids, vocab = table.columns[column]
+        print '%s: %d words, %d occurrences' % (column, len(vocab), len(ids))
+
+if __name__ == '__main__':
+    start_time = time.time()
+    main()
+    print "---%f seconds---" % (time.time() - start_time)
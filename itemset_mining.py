@@ -0,0 +1,745 @@
+### Author: Edward Huang
+
+import cPickle
+import heapq
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+### This module contains the itemset miners shared by the ZRS and HIS mining
+### scripts. Transactions are sequences of integer item ids, and every miner
+### returns itemsets as frozensets along with their support counts.
+
+class _FPNode(object):
+    __slots__ = ['item', 'count', 'parent', 'children']
+
+    def __init__(self, item, count, parent):
+        self.item = item
+        self.count = count
+        self.parent = parent
+        self.children = {}
+
+class ItemsetTree(object):
+    '''
+    Prefix tree of itemsets, used to check whether a query itemset is a subset
+    of an itemset already in the tree. Itemsets are stored with their items
+    sorted by rank, and every node is linked from a header table so that a
+    query only walks the branches that end in its last item.
+    '''
+    __slots__ = ['root', 'header', 'rank', 'num_nodes']
+
+    def __init__(self, rank=None):
+        self.root = _FPNode(None, 0, None)
+        self.header = {}
+        # Items are ordered by their own ids if no rank is given.
+        self.rank = rank
+        self.num_nodes = 0
+
+    def sort_items(self, items):
+        if self.rank is None:
+            return sorted(items)
+        rank = self.rank
+        return sorted(items, key=lambda item: rank[item])
+
+    def insert(self, items):
+        node = self.root
+        for item in self.sort_items(items):
+            if item not in node.children:
+                child = _FPNode(item, 0, node)
+                node.children[item] = child
+                self.header.setdefault(item, []).append(child)
+                self.num_nodes += 1
+            node = node.children[item]
+        node.count += 1
+
+    def contains_superset(self, items):
+        '''
+        Returns True if some itemset in the tree contains every item in items.
+        '''
+        items = self.sort_items(items)
+        if len(items) == 0:
+            return self.num_nodes > 0
+        rank = self.rank
+        for node in self.header.get(items[-1], []):
+            # Walk towards the root, matching the remaining items in order.
+            i = len(items) - 2
+            ancestor = node.parent
+            while i >= 0 and ancestor.item is not None:
+                if ancestor.item == items[i]:
+                    i -= 1
+                elif rank is None and ancestor.item < items[i]:
+                    break
+                elif rank is not None and rank[ancestor.item] < rank[
+                    items[i]]:
+                    break
+                ancestor = ancestor.parent
+            if i < 0:
+                return True
+        return False
+
+class Constraint(object):
+    '''
+    Item-class and length constraints on the mined itemsets. item_class maps
+    each item id to its class (e.g. 'herb' or 'symptom'), and every accepted
+    itemset must contain at least one item of each required class.
+    '''
+    __slots__ = ['item_class', 'required_classes', 'min_len', 'max_len']
+
+    def __init__(self, item_class=None, required_classes=(), min_len=1,
+        max_len=None):
+        self.item_class = item_class
+        self.required_classes = set(required_classes)
+        self.min_len = min_len
+        self.max_len = max_len
+
+    def get_missing_classes(self, items):
+        if len(self.required_classes) == 0:
+            return set([])
+        return self.required_classes.difference([self.item_class[item] for (
+            item) in items])
+
+    def accepts(self, items):
+        if len(items) < self.min_len:
+            return False
+        if self.max_len is not None and len(items) > self.max_len:
+            return False
+        return len(self.get_missing_classes(items)) == 0
+
+    def may_contain(self, head, tail):
+        '''
+        Returns False if no itemset that contains head and is contained in
+        head + tail can satisfy the constraint, so the branch can be pruned.
+        '''
+        head, tail = set(head), set(tail)
+        if len(head | tail) < self.min_len:
+            return False
+        missing_classes = self.get_missing_classes(head)
+        if len(missing_classes) > 0 and len(missing_classes - set([
+            self.item_class[item] for item in tail])) > 0:
+            return False
+        # Every missing class needs one more item.
+        if self.max_len is not None and len(head) + len(
+            missing_classes) > self.max_len:
+            return False
+        return True
+
+def _get_item_counts(weighted_transactions):
+    item_counts = {}
+    for items, count in weighted_transactions:
+        for item in items:
+            if item in item_counts:
+                item_counts[item] += count
+            else:
+                item_counts[item] = count
+    return item_counts
+
+def _build_fp_tree(weighted_transactions, min_support, rank):
+    '''
+    Builds an FP-tree from (items, count) pairs, keeping only the items with
+    at least min_support. Items on every path are sorted by the global rank, so
+    conditional trees never have to be reordered. Returns the root, the header
+    table (item -> list of nodes), and the support of each kept item.
+    '''
+    item_counts = _get_item_counts(weighted_transactions)
+    item_counts = dict((item, count) for item, count in item_counts.items() if (
+        count >= min_support))
+    root = _FPNode(None, 0, None)
+    header = {}
+    for items, count in weighted_transactions:
+        items = sorted([item for item in items if item in item_counts],
+            key=lambda item: rank[item])
+        node = root
+        for item in items:
+            if item in node.children:
+                node = node.children[item]
+                node.count += count
+            else:
+                child = _FPNode(item, count, node)
+                node.children[item] = child
+                header.setdefault(item, []).append(child)
+                node = child
+    return root, header, item_counts
+
+def _get_single_path(root):
+    '''
+    Returns the list of nodes on the tree's only path, or None if the tree
+    branches.
+    '''
+    path = []
+    node = root
+    while len(node.children) == 1:
+        node = node.children.values()[0]
+        path += [node]
+    if len(node.children) > 1:
+        return None
+    return path
+
+def _get_conditional_base(header, item):
+    '''
+    Returns the conditional pattern base of item as (prefix items, count) pairs.
+    '''
+    base = []
+    for node in header[item]:
+        prefix = []
+        ancestor = node.parent
+        while ancestor.item is not None:
+            prefix += [ancestor.item]
+            ancestor = ancestor.parent
+        if len(prefix) > 0:
+            base += [(prefix, node.count)]
+    return base
+
+def _get_global_rank(weighted_transactions, min_support):
+    '''
+    Ranks the frequent items by descending support, breaking ties by item id.
+    '''
+    item_counts = _get_item_counts(weighted_transactions)
+    frequent_items = [item for item in item_counts if (
+        item_counts[item] >= min_support)]
+    frequent_items.sort(key=lambda item: (-item_counts[item], item))
+    return dict((item, i) for i, item in enumerate(frequent_items))
+
+def _fpgrowth(header, item_counts, head, min_support, rank, constraint,
+    top_items=None):
+    # top_items restricts the items the head is extended with at this level.
+    items = header.keys() if top_items is None else [item for item in (
+        top_items) if item in header]
+    for item in sorted(items, key=lambda item: rank[item], reverse=True):
+        new_head = head + [item]
+        base = _get_conditional_base(header, item)
+        cond_counts = _get_item_counts(base)
+        tail = [cond_item for cond_item in cond_counts if (
+            cond_counts[cond_item] >= min_support)]
+        if constraint.max_len is not None and len(new_head) >= (
+            constraint.max_len):
+            tail = []
+        # Prune the branch if nothing in it can satisfy the constraint.
+        if not constraint.may_contain(new_head, tail):
+            continue
+        if constraint.accepts(new_head):
+            yield frozenset(new_head), item_counts[item]
+        if len(tail) == 0:
+            continue
+        cond_root, cond_header, cond_item_counts = _build_fp_tree(base,
+            min_support, rank)
+        for pattern in _fpgrowth(cond_header, cond_item_counts, new_head,
+            min_support, rank, constraint):
+            yield pattern
+
+def fpgrowth(transactions, min_support, item_class=None, required_classes=(),
+    min_len=1, max_len=None):
+    '''
+    Mines the frequent itemsets with FP-growth. Branches that cannot produce an
+    itemset with an item of every required class, or with a length between
+    min_len and max_len, are pruned during the search. Yields each frequent
+    itemset (a frozenset) with its support.
+    '''
+    constraint = Constraint(item_class, required_classes, min_len, max_len)
+    weighted_transactions = [(set(transaction), 1) for transaction in (
+        transactions)]
+    rank = _get_global_rank(weighted_transactions, min_support)
+    root, header, item_counts = _build_fp_tree(weighted_transactions,
+        min_support, rank)
+    for pattern in _fpgrowth(header, item_counts, [], min_support, rank,
+        constraint):
+        yield pattern
+
+def _fpmax(root, header, item_counts, head, min_support, rank, constraint,
+    mfi_tree, max_patterns):
+    # If the tree is a single path, the head plus the whole path is the only
+    # maximal candidate below this node, unless the path is too long.
+    path = _get_single_path(root)
+    if path is not None and len(path) > 0 and (constraint.max_len is None or
+        len(head) + len(path) <= constraint.max_len):
+        candidate = head + [node.item for node in path]
+        if constraint.accepts(candidate) and (
+            not mfi_tree.contains_superset(candidate)):
+            mfi_tree.insert(candidate)
+            max_patterns[frozenset(candidate)] = path[-1].count
+        return
+
+    # Visit the least frequent items first, so that every superset of a
+    # candidate is already in the maximal itemset tree when the candidate is
+    # checked.
+    for item in sorted(header, key=lambda item: rank[item], reverse=True):
+        new_head = head + [item]
+        base = _get_conditional_base(header, item)
+        cond_counts = _get_item_counts(base)
+        tail = [cond_item for cond_item in cond_counts if (
+            cond_counts[cond_item] >= min_support)]
+        if constraint.max_len is not None and len(new_head) >= (
+            constraint.max_len):
+            tail = []
+        # Prune the branch if nothing in it can satisfy the constraint.
+        if not constraint.may_contain(new_head, tail):
+            continue
+        # Skip the branch if everything it can produce is already covered.
+        if mfi_tree.contains_superset(new_head + tail):
+            continue
+        if len(tail) == 0:
+            mfi_tree.insert(new_head)
+            max_patterns[frozenset(new_head)] = item_counts[item]
+            continue
+        cond_root, cond_header, cond_item_counts = _build_fp_tree(base,
+            min_support, rank)
+        _fpmax(cond_root, cond_header, cond_item_counts, new_head,
+            min_support, rank, constraint, mfi_tree, max_patterns)
+
+def fpmax(transactions, min_support, item_class=None, required_classes=(),
+    min_len=1, max_len=None):
+    '''
+    Mines the maximal frequent itemsets with FPMax. Candidates are checked
+    against a maximal itemset tree instead of every pattern found so far.
+    The constraints are the same as in fpgrowth, and an itemset is maximal
+    among the itemsets that satisfy them. Returns a dictionary mapping each
+    maximal itemset (a frozenset) to its support.
+    '''
+    constraint = Constraint(item_class, required_classes, min_len, max_len)
+    weighted_transactions = [(set(transaction), 1) for transaction in (
+        transactions)]
+    rank = _get_global_rank(weighted_transactions, min_support)
+    root, header, item_counts = _build_fp_tree(weighted_transactions,
+        min_support, rank)
+    max_patterns = {}
+    _fpmax(root, header, item_counts, [], min_support, rank, constraint,
+        ItemsetTree(rank), max_patterns)
+    return max_patterns
+
+def _charm(members, use_diffsets, min_support, constraint, max_len,
+    closed_dct):
+    '''
+    Extends one equivalence class of CHARM. Each member is a list of
+    [itemset, tidset or diffset, support, sum of transaction ids]. The top-level
+    class holds tidsets, and every class below it holds diffsets relative to its
+    prefix. Yields the closed itemsets of the class along with their supports.
+    '''
+    removed = set([])
+    for i in range(len(members)):
+        if i in removed:
+            continue
+        x_items, x_set, x_support, x_tidsum = members[i]
+        x_items = set(x_items)
+        # Prune X if neither X nor any extension of it can satisfy the
+        # constraint. The closure of an itemset that satisfies the constraint
+        # satisfies it as well, so no closure is lost.
+        tail = set([])
+        for j in range(i + 1, len(members)):
+            if j not in removed:
+                tail |= members[j][0]
+        if not constraint.may_contain(x_items, tail):
+            continue
+        children = []
+        for j in range(i + 1, len(members)):
+            if j in removed:
+                continue
+            y_items, y_set, y_support, y_tidsum = members[j]
+            # Diffset of XY relative to X: t(X) - t(Y), or d(Y) - d(X).
+            if use_diffsets:
+                diffset = y_set - x_set
+            else:
+                diffset = x_set - y_set
+            support = x_support - len(diffset)
+            if support < min_support:
+                continue
+            x_in_y = support == x_support
+            y_in_x = support == y_support
+            if x_in_y and y_in_x:
+                # t(X) = t(Y): Y always comes with X.
+                x_items |= y_items
+                removed.add(j)
+            elif x_in_y:
+                # t(X) is a subset of t(Y): Y is in the closure of X.
+                x_items |= y_items
+            else:
+                # Y is subsumed by X only if t(Y) is a subset of t(X).
+                if y_in_x:
+                    removed.add(j)
+                children += [[y_items, diffset, support, x_tidsum - sum(
+                    diffset)]]
+
+        if len(children) > 0:
+            # The items merged into X above belong to every child as well.
+            for child in children:
+                child[0] = x_items | child[0]
+            children.sort(key=lambda child: child[2])
+            for pattern in _charm(children, True, min_support, constraint,
+                max_len, closed_dct):
+                yield pattern
+
+        # X is closed unless a known closed itemset with the same tidset
+        # contains it. Equal tidsets have equal supports and sums.
+        key = (x_support, x_tidsum)
+        x_items = frozenset(x_items)
+        if key in closed_dct:
+            if any(x_items <= closed for closed in closed_dct[key]):
+                continue
+            closed_dct[key] += [x_items]
+        else:
+            closed_dct[key] = [x_items]
+        # X is kept for the subsumption check even if it is not written out.
+        if constraint.accepts(x_items) and (max_len is None or len(
+            x_items) <= max_len):
+            yield x_items, x_support
+
+def charm(transactions, min_support, item_class=None, required_classes=(),
+    min_len=1, max_len=None):
+    '''
+    Mines the closed frequent itemsets with CHARM, using diffsets over integer
+    transaction ids. Yields each closed itemset (a frozenset) with its exact
+    support as soon as it is known to be closed. The class and minimum length
+    constraints prune the search as in fpgrowth, but max_len only filters the
+    output, since a longer closed superset is needed to tell whether a shorter
+    itemset is closed.
+    '''
+    constraint = Constraint(item_class, required_classes, min_len)
+    tidset_dct = {}
+    for tid, transaction in enumerate(transactions):
+        for item in transaction:
+            if item in tidset_dct:
+                tidset_dct[item].add(tid)
+            else:
+                tidset_dct[item] = set([tid])
+    members = [[set([item]), tidset, len(tidset), sum(tidset)] for (item,
+        tidset) in tidset_dct.items() if len(tidset) >= min_support]
+    members.sort(key=lambda member: (member[2], min(member[0])))
+    for pattern in _charm(members, False, min_support, constraint, max_len,
+        {}):
+        yield pattern
+
+def _push_top_pattern(heap, k, pattern, support):
+    '''
+    Keeps the k highest-support patterns in a min-heap of (support, items).
+    '''
+    if len(heap) < k:
+        heapq.heappush(heap, (support, tuple(sorted(pattern))))
+    elif support > heap[0][0]:
+        heapq.heapreplace(heap, (support, tuple(sorted(pattern))))
+
+def _get_top_threshold(heap, k):
+    '''
+    Returns the support a pattern needs to enter the heap. Once the heap is
+    full, only a strictly higher support than the lowest one replaces it.
+    '''
+    if len(heap) < k:
+        return 1
+    return heap[0][0] + 1
+
+def _topk(header, item_counts, head, rank, constraint, k, heap):
+    # Visit the most frequent items first, so that the heap fills with high
+    # supports and the threshold rises early.
+    for item in sorted(header, key=lambda item: rank[item]):
+        min_support = _get_top_threshold(heap, k)
+        if item_counts[item] < min_support:
+            continue
+        new_head = head + [item]
+        base = _get_conditional_base(header, item)
+        cond_counts = _get_item_counts(base)
+        tail = [cond_item for cond_item in cond_counts if (
+            cond_counts[cond_item] >= min_support)]
+        if constraint.max_len is not None and len(new_head) >= (
+            constraint.max_len):
+            tail = []
+        # Prune the branch if nothing in it can satisfy the constraint.
+        if not constraint.may_contain(new_head, tail):
+            continue
+        if constraint.accepts(new_head):
+            _push_top_pattern(heap, k, new_head, item_counts[item])
+        if len(tail) == 0:
+            continue
+        cond_root, cond_header, cond_item_counts = _build_fp_tree(base,
+            _get_top_threshold(heap, k), rank)
+        _topk(cond_header, cond_item_counts, new_head, rank, constraint, k,
+            heap)
+
+def topk(transactions, k, item_class=None, required_classes=(), min_len=1,
+    max_len=None, maximal=False):
+    '''
+    Mines the k frequent itemsets with the highest supports, without a support
+    threshold. FP-growth keeps the best itemsets found so far in a heap, and
+    raises the threshold to the lowest support in the heap once it is full.
+    The constraints are the same as in fpgrowth. If maximal is True, returns
+    the maximal itemsets at the support of the k-th itemset instead, which
+    cover the top k. Returns a list of (itemset, support) pairs, by descending
+    support.
+    '''
+    constraint = Constraint(item_class, required_classes, min_len, max_len)
+    weighted_transactions = [(set(transaction), 1) for transaction in (
+        transactions)]
+    rank = _get_global_rank(weighted_transactions, 1)
+    root, header, item_counts = _build_fp_tree(weighted_transactions, 1, rank)
+    heap = []
+    _topk(header, item_counts, [], rank, constraint, k, heap)
+    if maximal and len(heap) > 0:
+        patterns = fpmax(transactions, heap[0][0], item_class,
+            required_classes, min_len, max_len).items()
+    else:
+        patterns = [(frozenset(items), support) for support, items in heap]
+    return sorted(patterns, key=lambda x: x[1], reverse=True)
+
+def _get_group_shards(weighted_transactions, rank, num_groups):
+    '''
+    Splits the transactions into one projected database per group of items.
+    Items are dealt to the groups round-robin in rank order. A transaction
+    contributes to a group its prefix (in rank order) up to its last item in
+    that group, which holds every conditional pattern base of the group's
+    items. Duplicate prefixes are merged into weighted transactions.
+    '''
+    shards = [{} for group in range(num_groups)]
+    for items, count in weighted_transactions:
+        items = sorted([item for item in items if item in rank],
+            key=lambda item: rank[item])
+        # Position of the last item of each group in the transaction.
+        last_positions = {}
+        for position, item in enumerate(items):
+            last_positions[rank[item] % num_groups] = position
+        for group, position in last_positions.items():
+            prefix = tuple(items[:position + 1])
+            if prefix in shards[group]:
+                shards[group][prefix] += count
+            else:
+                shards[group][prefix] = count
+    return [shard.items() for shard in shards]
+
+def _write_sorted_patterns(patterns, fname):
+    '''
+    Writes (itemset, support) pairs sorted by descending support, then by
+    items, one per line as the support and the comma-separated item ids.
+    '''
+    patterns = sorted([(-support, sorted(itemset)) for itemset, support in (
+        patterns)])
+    out = open(fname, 'w')
+    for support, itemset in patterns:
+        out.write('%d\t%s\n' % (-support, ','.join(map(str, itemset))))
+    out.close()
+
+def _read_sorted_patterns(fname):
+    '''
+    Yields the (-support, items) pairs written by _write_sorted_patterns, so
+    that several files can be merged with heapq.merge.
+    '''
+    f = open(fname, 'r')
+    for line in f:
+        support, itemset = line.rstrip('\n').split('\t')
+        yield -int(support), map(int, itemset.split(','))
+    f.close()
+
+def _mine_group(args):
+    '''
+    Mines the itemsets whose lowest-ranked item belongs to one group, and
+    writes them to a sorted file. Runs in a worker process.
+    '''
+    (shard, rank, group_items, min_support, constraint_args, fname) = args
+    constraint = Constraint(*constraint_args)
+    root, header, item_counts = _build_fp_tree(shard, min_support, rank)
+    _write_sorted_patterns(_fpgrowth(header, item_counts, [], min_support,
+        rank, constraint, group_items), fname)
+    return fname
+
+def parallel_fpgrowth(transactions, min_support, num_processes=None,
+    item_class=None, required_classes=(), min_len=1, max_len=None):
+    '''
+    Mines the frequent itemsets with FP-growth in a pool of processes. The
+    search space is split by the lowest-ranked item of each itemset: every
+    group of items gets its own projected database and is mined in a worker.
+    The workers write sorted files, which are merged here. Yields each
+    frequent itemset (a frozenset) with its support, by descending support.
+    The constraints are the same as in fpgrowth.
+    '''
+    if num_processes is None:
+        num_processes = multiprocessing.cpu_count()
+    # More groups than processes evens out the uneven group sizes.
+    num_groups = 4 * num_processes
+    weighted_transactions = [(set(transaction), 1) for transaction in (
+        transactions)]
+    rank = _get_global_rank(weighted_transactions, min_support)
+    shards = _get_group_shards(weighted_transactions, rank, num_groups)
+    group_items = [[] for group in range(num_groups)]
+    for item in rank:
+        group_items[rank[item] % num_groups] += [item]
+
+    tmp_dir = tempfile.mkdtemp()
+    constraint_args = (item_class, required_classes, min_len, max_len)
+    tasks = [(shards[group], rank, group_items[group], min_support,
+        constraint_args, os.path.join(tmp_dir, 'group_%d.txt' % group)) for (
+        group) in range(num_groups) if len(group_items[group]) > 0]
+    pool = multiprocessing.Pool(num_processes)
+    fnames = pool.map(_mine_group, tasks, chunksize=1)
+    pool.close()
+    pool.join()
+
+    try:
+        for support, itemset in heapq.merge(*[_read_sorted_patterns(
+            fname) for fname in fnames]):
+            yield frozenset(itemset), -support
+    finally:
+        shutil.rmtree(tmp_dir)
+
+def _compress_transactions(transactions, multiset=None):
+    '''
+    Adds the transactions to a multiset mapping each sorted tuple of distinct
+    items to the number of transactions with exactly those items.
+    '''
+    if multiset is None:
+        multiset = {}
+    for transaction in transactions:
+        items = tuple(sorted(set(transaction)))
+        if items in multiset:
+            multiset[items] += 1
+        else:
+            multiset[items] = 1
+    return multiset
+
+def _grow_updated(database, head, min_support, rank, constraint):
+    '''
+    Projection-based FP-growth over (items, total count, new count) triples,
+    where the items of each triple are sorted by rank. Only itemsets that occur
+    in at least one new transaction are grown, since the support of every other
+    itemset is unchanged. Yields each such frequent itemset with its support.
+    '''
+    totals, news = {}, {}
+    for items, total, new in database:
+        for item in items:
+            if item in totals:
+                totals[item] += total
+                news[item] += new
+            else:
+                totals[item] = total
+                news[item] = new
+    candidates = [item for item in totals if totals[item] >= min_support and (
+        news[item] > 0)]
+    for item in sorted(candidates, key=lambda item: rank[item], reverse=True):
+        new_head = head + [item]
+        # The projected database holds the items ranked before item.
+        projected = []
+        for items, total, new in database:
+            if item in items:
+                prefix = items[:items.index(item)]
+                if len(prefix) > 0:
+                    projected += [(prefix, total, new)]
+        tail = set([])
+        for items, total, new in projected:
+            tail.update(items)
+        if constraint.max_len is not None and len(new_head) >= (
+            constraint.max_len):
+            tail = set([])
+        # Prune the branch if nothing in it can satisfy the constraint.
+        if not constraint.may_contain(new_head, list(tail)):
+            continue
+        if constraint.accepts(new_head):
+            yield frozenset(new_head), totals[item]
+        if len(tail) == 0:
+            continue
+        for pattern in _grow_updated(projected, new_head, min_support, rank,
+            constraint):
+            yield pattern
+
+def create_state(transactions, min_support, mode='freq', item_class=None,
+    required_classes=(), min_len=1, max_len=None):
+    '''
+    Mines the transactions, and returns the state that update_state needs to
+    maintain the result: the transactions as a multiset, the settings, and
+    either every frequent itemset (freq mode) or the maximal ones (max mode),
+    each mapped to its support.
+    '''
+    assert mode in ['freq', 'max']
+    if mode == 'freq':
+        patterns = dict(fpgrowth(transactions, min_support, item_class,
+            required_classes, min_len, max_len))
+    else:
+        patterns = fpmax(transactions, min_support, item_class,
+            required_classes, min_len, max_len)
+    return {'mode' : mode, 'min_support' : min_support,
+        'constraint' : (item_class, required_classes, min_len, max_len),
+        'num_transactions' : len(transactions),
+        'transactions' : _compress_transactions(transactions),
+        'patterns' : patterns}
+
+def update_state(state, new_transactions, item_class=None):
+    '''
+    Updates the state from create_state with transactions appended since it
+    was made. Supports never drop, so only the itemsets in a new transaction
+    are recounted, over the whole history; newly frequent itemsets are added,
+    and in max mode, maximal itemsets that gained a frequent superset are
+    dropped. item_class replaces the stored item classes if the vocabulary
+    grew. Returns the itemsets whose support changed, with their supports.
+    '''
+    constraint_args = list(state['constraint'])
+    if item_class is not None:
+        constraint_args[0] = item_class
+    state['constraint'] = tuple(constraint_args)
+    constraint = Constraint(*constraint_args)
+    min_support = state['min_support']
+
+    new_multiset = _compress_transactions(new_transactions)
+    multiset = state['transactions']
+    database = [(items, count + new_multiset.get(items, 0), new_multiset.get(
+        items, 0)) for items, count in multiset.items()] + [(items, count,
+        count) for items, count in new_multiset.items() if (
+        items not in multiset)]
+    # Rank the items by descending support, so that the projected databases of
+    # the rarer items are the smallest.
+    rank = _get_global_rank([(items, total) for items, total, new in (
+        database)], min_support)
+    database = [(tuple(sorted([item for item in items if item in rank],
+        key=lambda item: rank[item])), total, new) for items, total, new in (
+        database)]
+    updated = dict(_grow_updated([triple for triple in database if (
+        len(triple[0]) > 0)], [], min_support, rank, constraint))
+
+    patterns = state['patterns']
+    if state['mode'] == 'freq':
+        patterns.update(updated)
+    else:
+        # Every frequent itemset is either a subset of an old maximal itemset,
+        # or occurs in a new transaction. The longest candidates go first, so
+        # a candidate is maximal exactly when no kept candidate contains it.
+        candidates = dict((pattern, support) for pattern, support in (
+            patterns.items()) if pattern not in updated)
+        candidates.update(updated)
+        max_tree = ItemsetTree(rank)
+        patterns = {}
+        for pattern in sorted(candidates, key=len, reverse=True):
+            if not max_tree.contains_superset(pattern):
+                max_tree.insert(pattern)
+                patterns[pattern] = candidates[pattern]
+        state['patterns'] = patterns
+        updated = dict((pattern, support) for pattern, support in (
+            updated.items()) if pattern in patterns)
+
+    for items, count in new_multiset.items():
+        multiset[items] = multiset.get(items, 0) + count
+    state['num_transactions'] += len(new_transactions)
+    return updated
+
+def remap_state(state, id_map):
+    '''
+    Renumbers the items in the state, for when the vocabulary that assigns the
+    item ids has been rebuilt. id_map maps each old id to its new id.
+    '''
+    multiset = {}
+    for items, count in state['transactions'].items():
+        multiset[tuple(sorted([id_map[item] for item in items]))] = count
+    state['transactions'] = multiset
+    state['patterns'] = dict((frozenset([id_map[item] for item in pattern]),
+        support) for pattern, support in state['patterns'].items())
+
+def matches_state(state, transactions):
+    '''
+    Returns True if the first transactions are the ones the state was made
+    from, up to their order, so that the rest can be passed to update_state.
+    '''
+    num_transactions = state['num_transactions']
+    return len(transactions) >= num_transactions and _compress_transactions(
+        transactions[:num_transactions]) == state['transactions']
+
+def write_state(state, fname):
+    out = open(fname, 'wb')
+    cPickle.dump(state, out, cPickle.HIGHEST_PROTOCOL)
+    out.close()
+
+def read_state(fname):
+    f = open(fname, 'rb')
+    state = cPickle.load(f)
+    f.close()
+    return state
@@ -1,98 +1,152 @@
 ### Author: Edward Huang
 
-from pymining import itemmining
+import itemset_mining
+import os
+import sys
 import time
+import zrs_vocabulary
 
 ### This script takes the symptoms and drugs prescribed to each patient, and
 ### attempts to mine the frequent patterns from these two sets across all of the
-### patients in the ZRS dataset.
+### patients in the ZRS dataset. The default mode mines only the maximal
+### patterns, which replaces ZRS_freq_to_max_patt.py. The closed mode keeps the
+### exact supports of every closed pattern. Patterns without a drug, and
+### single items, are pruned during the search instead of after it. Maximal
+### patterns must also have a symptom, since only those become rules. With
+### incremental, the freq and max patterns are kept in a state file, and later
+### runs only mine the visits appended since the last run. The topk and
+### topk_max modes need no MIN_SUP: they keep the k drug and symptom patterns
+### with the highest supports, or the maximal patterns that cover them.
 
 MIN_SUP = 2
+TOP_K = 1000
+STATE_FNAME = './data/ZRS_%s_state.pkl'
 
-if __name__ == '__main__':
-    start_time = time.time()
+# Writes out each pattern along with its support. Patterns are (item set,
+# support) pairs, and may be streamed from a generator.
+def write_patterns(patterns, vocabulary, fname):
+    out = open(fname, 'w')
+    for item_set, freq in patterns:
+        for item in item_set:
+            out.write(vocabulary[item][0] + ', ')
+        out.write('%d\n' % freq)
+    out.close()
 
-    # Used to map the Chinese phrases to ints.
-    symptom_drug_list = []
+def update_patterns(transactions, visit_nos, mode, vocabulary, item_class,
+    **constraint):
+    '''
+    Updates the patterns in the state file with the visits added since it was
+    written, or mines every visit if there is no usable state. The vocabulary
+    is rebuilt by normalize_ZRS_data.py, so the stored ids are mapped to the
+    new ones through their terms. New visits are found by visit number. Every
+    visit is mined again if a term was added, removed, or changed type, or if
+    a mined visit is gone or now has other terms, since thresholds computed
+    on the grown file can change the old visits. Returns the patterns.
+    '''
+    fname = STATE_FNAME % mode
+    # Each visit as its sorted terms, which do not depend on the ids.
+    visit_terms = dict((visit_no, tuple(sorted([vocabulary[item][0] for item in
+        transaction]))) for visit_no, transaction in zip(visit_nos,
+        transactions))
+    state = None
+    if os.path.exists(fname):
+        state = itemset_mining.read_state(fname)
+        terms = set([(term, term_type) for term, term_type, df in vocabulary])
+        if state['min_support'] != MIN_SUP or 'visits' not in state or set(
+            state['terms']) != terms:
+            print 'Vocabulary or settings changed, mining every visit...'
+            state = None
+        elif any(visit_terms.get(visit_no) != mined_terms for visit_no,
+            mined_terms in state['visits'].iteritems()):
+            print 'Mined visits changed, mining every visit...'
+            state = None
+    if state is None:
+        state = itemset_mining.create_state(transactions, MIN_SUP, mode,
+            item_class, **constraint)
+    else:
+        new_ids = dict((term, i) for i, (term, term_type, df) in enumerate(
+            vocabulary))
+        itemset_mining.remap_state(state, dict((i, new_ids[term]) for (i,
+            (term, term_type)) in enumerate(state['terms'])))
+        new_transactions = [transaction for visit_no, transaction in zip(
+            visit_nos, transactions) if visit_no not in state['visits']]
+        print 'Updating with %d new visits...' % len(new_transactions)
+        itemset_mining.update_state(state, new_transactions, item_class)
+    state['terms'] = [(term, term_type) for term, term_type, df in vocabulary]
+    state['visits'] = visit_terms
+    itemset_mining.write_state(state, fname)
+    return state['patterns']
 
-    # Dictionary, with keys as patient ids, as values as lists of symptoms.
-    symptom_dct = {}
-    # symptom_visit_nos = set([])
-    # Read in the symptoms file.
-    f = open('./data/norm_ZRS_patient_symptoms.txt', 'r')
-    for line in f:
-        line = line.split()
-        visit_no = line[0]
-        symptoms = line[1:]
-        symptom_dct[visit_no] = symptoms
-        # symptom_visit_nos.add(visit_no)
-        for symptom in symptoms:
-            if symptom not in symptom_drug_list:
-                symptom_drug_list += [symptom]
-    f.close()
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    incremental = len(args) > 0 and args[0] == 'incremental'
+    if incremental:
+        args = args[1:]
+    modes = ['freq', 'max'] if incremental else ['freq', 'max', 'closed',
+        'topk', 'topk_max']
+    if len(args) > 2 or (len(args) > 0 and args[0] not in modes) or (len(
+        args) == 2 and args[0] not in ['topk', 'topk_max']):
+        print 'Usage: %s [incremental] [freq/max/closed/topk/topk_max] [k]' % (
+            sys.argv[0])
+        exit()
+    mode = 'max'
+    if len(args) > 0:
+        mode = args[0]
+    k = TOP_K
+    if len(args) == 2:
+        k = int(args[1])
 
-    drug_dct = {}
-    drug_set = set([])
-    # drug_visit_nos = set([])
-    f = open('./data/norm_ZRS_patient_drugs.txt', 'r')
-    for i, line in enumerate(f):
-        # Skip the header.
-        if i == 0:
-            continue
-        line = line.split()
-        visit_no = line[0]
-        drugs = line[1:]
-        if visit_no in drug_dct:
-            drug_dct[visit_no] += drugs
-        else:
-            drug_dct[visit_no] = drugs
-        for drug in drugs:
-            drug_set.add(drug)
-            if drug not in symptom_drug_list:
-                symptom_drug_list += [drug]
-        # drug_visit_nos.add(visit_no)
-    f.close()
+    start_time = time.time()
 
-    # There are 1887 symptom visits, but only 1618 drug visits. However, all
-    # drug visits have symptom visits.
-    # shared_visit_nos = drug_visit_nos.intersection(symptom_visit_nos)
+    # Used to map the integer ids back to the Chinese phrases.
+    vocabulary, term_to_id = zrs_vocabulary.read_vocabulary()
 
     # Lump drugs and symptoms together as transactions for each visit number.
-    transactions = []
-    for visit_no in symptom_dct:
+    # There are 1887 symptom visits, but only 1618 drug visits. However, all
+    # drug visits have symptom visits.
+    transactions, visit_nos = [], []
+    for visit_no, symptoms, drugs in zrs_vocabulary.read_transactions():
         # Skip visits that do not have a prescription.
-        if visit_no not in drug_dct:
-            continue
-        symptoms = symptom_dct[visit_no]
-        symptoms = [symptom_drug_list.index(symptom) for symptom in symptoms]
-        drugs = drug_dct[visit_no]
-        drugs = [symptom_drug_list.index(drug) for drug in drugs]
         if len(symptoms) == 0 or len(drugs) == 0:
             continue
         curr_trans = tuple(symptoms + drugs)
         transactions += [curr_trans]
+        visit_nos += [visit_no]
 
-    relim_input = itemmining.get_relim_input(transactions)
-    item_sets = itemmining.relim(relim_input, min_support=MIN_SUP)
-
-
-    out = open('./results/ZRS_freq_patterns.txt', 'w')
-    for item_set in item_sets:
-        if len(item_set) == 1:
-            continue
-        drug_in_item_set = False
-        for item in item_set:
-            item = symptom_drug_list[item]
-            if item in drug_set:
-                drug_in_item_set = True
-                break
-        if not drug_in_item_set:
-            continue
-        for item in item_set:
-            out.write(symptom_drug_list[item] + ', ')
-        freq = item_sets[item_set]
-        out.write('%d\n' % freq)
-    out.close()
+    # Tells the miners which items are drugs and which are symptoms.
+    item_class = [term_type for term, term_type, df in vocabulary]
+    if incremental and mode == 'freq':
+        item_sets = update_patterns(transactions, visit_nos, mode,
+            vocabulary, item_class, required_classes=['drug'], min_len=2)
+        write_patterns(item_sets.iteritems(), vocabulary,
+            './results/ZRS_freq_patterns.txt')
+    elif incremental and mode == 'max':
+        item_sets = update_patterns(transactions, visit_nos, mode,
+            vocabulary, item_class, required_classes=['drug', 'symptom'])
+        write_patterns(item_sets.iteritems(), vocabulary,
+            './results/ZRS_max_patterns.txt')
+    elif mode == 'freq':
+        item_sets = itemset_mining.fpgrowth(transactions, MIN_SUP, item_class,
+            required_classes=['drug'], min_len=2)
+        write_patterns(item_sets, vocabulary,
+            './results/ZRS_freq_patterns.txt')
+    elif mode == 'max':
+        item_sets = itemset_mining.fpmax(transactions, MIN_SUP, item_class,
+            required_classes=['drug', 'symptom'])
+        write_patterns(item_sets.iteritems(), vocabulary,
+            './results/ZRS_max_patterns.txt')
+    elif mode == 'closed':
+        item_sets = itemset_mining.charm(transactions, MIN_SUP, item_class,
+            required_classes=['drug'], min_len=2)
+        write_patterns(item_sets, vocabulary,
+            './results/ZRS_closed_patterns.txt')
+    elif mode in ['topk', 'topk_max']:
+        item_sets = itemset_mining.topk(transactions, k, item_class,
+            required_classes=['drug', 'symptom'], maximal=(mode == 'topk_max'))
+        if len(item_sets) > 0:
+            print 'Support of the top patterns: %d' % item_sets[-1][1]
+        write_patterns(item_sets, vocabulary,
+            './results/ZRS_%s_patterns.txt' % mode)
 
     # print 'Mining associations...'
     # mine_assoc_rules(item_sets, min_support=MIN_SUP, min_confidence=0.5)
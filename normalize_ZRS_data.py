@@ -1,10 +1,13 @@
 ### Author: Edward Huang
 
+from collections import OrderedDict
 # import matplotlib.pyplot as plt
+import zrs_vocabulary
 
 ### This script normalizes the drug and symptom data. It counts the occurrences
 ### for each drug and symptom, and then removes the ones that appear in too 
-### many patient visits. Similar to inverse document frequency.
+### many patient visits. Similar to inverse document frequency. Also writes the
+### shared vocabulary and the integer-encoded transactions for later stages.
 
 if __name__ == '__main__':
     print 'Normalizing symptoms...'
@@ -37,6 +40,7 @@ if __name__ == '__main__':
     # plt.show()
 
     # Write out a new file without common symptoms.
+    norm_symptom_dct = OrderedDict({})
     f = open('./data/ZRS_patient_symptoms.txt', 'r')
     out = open('./data/norm_ZRS_patient_symptoms.txt', 'w')
     for line in f:
@@ -47,6 +51,7 @@ if __name__ == '__main__':
         for symptom in symptoms:
             if symptom not in common_symptoms:
                 new_symptoms += [symptom]
+        norm_symptom_dct[visit_no] = new_symptoms
         out.write(visit_no + '\t' + '\t'.join(new_symptoms) + '\n')
     out.close()
     f.close()
@@ -77,10 +82,13 @@ if __name__ == '__main__':
             common_drugs.add(drug)
 
     # Write out a new file without common drugs.
+    norm_drug_dct = OrderedDict({})
     f = open('./data/ZRS_patient_drugs.txt', 'r')
     out = open('./data/norm_ZRS_patient_drugs.txt', 'w')
-    for line in f:
+    for i, line in enumerate(f):
+        # Keep the header.
         if i == 0:
+            out.write(line)
             continue
         line = line.split()
         visit_no = line[0]
@@ -89,6 +97,19 @@ if __name__ == '__main__':
         for drug in drugs:
             if drug not in common_drugs:
                 new_drugs += [drug]
+        if visit_no in norm_drug_dct:
+            norm_drug_dct[visit_no] += new_drugs
+        else:
+            norm_drug_dct[visit_no] = new_drugs
         out.write(visit_no + '\t' + '\t'.join(new_drugs) + '\n')
     out.close()
-    f.close()
\ No newline at end of file
+    f.close()
+
+    print 'Writing vocabulary...'
+    vocabulary = zrs_vocabulary.build_vocabulary(norm_symptom_dct,
+        norm_drug_dct)
+    zrs_vocabulary.write_vocabulary(vocabulary)
+    term_to_id = dict((term, term_id) for term_id, (term, term_type,
+        df) in enumerate(vocabulary))
+    zrs_vocabulary.write_transactions(norm_symptom_dct, norm_drug_dct,
+        term_to_id)
\ No newline at end of file
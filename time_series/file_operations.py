@@ -2,6 +2,13 @@
 # -*- coding: utf-8 -*-
 
 from collections import OrderedDict
+import os
+import sys
+
+# The visit table is shared with the HIS scripts.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    '..', 'his'))
+from visit_table import load_visit_table
 
 def get_medicine_dictionary_file():
     '''
@@ -53,20 +60,12 @@ def get_patient_dct():
     '''
     # A patient key is given by both the fake name and the date of birth.
     patient_dct = {}
-    f = open('./data/HIS_tuple_word.txt', 'r')
-    for i, line in enumerate(f):
-        diseases, name, dob, diagnosis_date, symptoms, herbs = line.split('\t')
-        # Always ends with a colon, so the last element of the split will be
-        # the empty string.
-        diseases = diseases.split(':')[:-1]
-        diagnosis_date = diagnosis_date.split('，')[1][:len('xxxx-xx-xx')]
-        symptoms = symptoms.split(':')[:-1]
-        herbs = herbs.split(':')[:-1]
+    for key, diagnosis_date, diseases, symptoms, herbs in load_visit_table(
+        ).iter_visits():
         # Add the listing to the dictionary.
-        key, value = (name, dob), (diseases, diagnosis_date, symptoms, herbs)
+        value = (diseases, diagnosis_date, symptoms, herbs)
         if key in patient_dct:
             patient_dct[key] += [value]
         else:
             patient_dct[key] = [value]
-    f.close()
     return patient_dct
\ No newline at end of file
@@ -6,67 +6,212 @@
 from collections import Counter
 import file_operations
 import math
+import numpy as np
 import operator
+import os
+from scipy import sparse
+import sys
 
-### This script reads the time series data and find the most frequent herbs,
-### and the symptoms that correspond the most to these herbs.
+# The pair sketch and top pair selection are shared with the HIS scripts.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    '..', 'his'))
+from cooccurrence import get_top_pairs
+from pair_sketch import count_pairs_exactly, sketch_pairs
 
-def get_frequent_herbs(patient_dct):
-    # One dictionary counting the herbs, one for the symptoms for each herb.
-    herb_count_dct = {}
-    herb_symptom_dct = {}
-    symptom_count_dct = {}
+### This script reads the time series data and find the most frequent herbs, and
+### the symptoms that correspond the most to these herbs. Co-occurrences are
+### counted in a sparse herb by symptom matrix, and every herb is scored. The
+### approx mode counts herb-symptom pairs in one pass with a pair sketch of the
+### given capacity instead, and only scores the pairs that the sketch keeps,
+### by the lower bounds of their counts unless they are counted exactly. The
+### sketch keeps the globally frequent pairs, so rare pairs with a high PMI
+### are missing from its symptom lists.
+
+# Symptoms that appear fewer times are not scored.
+MIN_SYMPTOM_COUNT = 10
+# Number of top symptoms written for each herb.
+NUM_SYMPTOMS_PER_HERB = 100
+# Number of visits whose pairs are summed into one batch in the approx mode.
+VISITS_PER_BATCH = 1024
 
+def get_frequent_herbs(patient_dct):
+    '''
+    Counts herb-symptom co-occurrences in one pass, as the sparse product of
+    the visit by herb and visit by symptom count matrices. A herb and a
+    symptom listed several times in a visit co-occur that many times over.
+    Writes every herb, most frequent first, with its top symptoms by PMI.
+    '''
+    herb_id_dct, symptom_id_dct = {}, {}
+    herb_ids, symptom_ids = [], []
+    # Offsets of each visit's herbs and symptoms.
+    herb_indptr, symptom_indptr = [0], [0]
     for key in patient_dct:
         patient_visit_list = patient_dct[key]
         for patient_visit in patient_visit_list:
             diseases, diagnosis_date, symptoms, herbs = patient_visit
-            for herb in herbs:
-                # Track the herb count for each herb.
-                if herb not in herb_count_dct:
-                    herb_count_dct[herb] = 1
-                    herb_symptom_dct[herb] = symptoms[:]
-                else:
-                    herb_count_dct[herb] += 1
-                    herb_symptom_dct[herb] += symptoms[:]
-            for symptom in symptoms:
-                if symptom not in symptom_count_dct:
-                    symptom_count_dct[symptom] = 1
-                else:
-                    symptom_count_dct[symptom] += 1
+            herb_ids += [herb_id_dct.setdefault(herb, len(herb_id_dct)) for (
+                herb) in herbs]
+            symptom_ids += [symptom_id_dct.setdefault(symptom, len(
+                symptom_id_dct)) for symptom in symptoms]
+            herb_indptr += [len(herb_ids)]
+            symptom_indptr += [len(symptom_ids)]
 
-    n = sum(symptom_count_dct.values()) + sum(herb_count_dct.values())
-    # Get the most frequent herbs.
-    frequent_herbs = sorted(herb_count_dct.items(), key=operator.itemgetter(1),
-        reverse=True)[:100]
-    # Get the top symptoms for each of the top herbs.
+    # Repeated ids in a row are summed into counts.
+    herb_matrix = sparse.csr_matrix((np.ones(len(herb_ids), dtype=np.int64),
+        herb_ids, herb_indptr), shape=(len(herb_indptr) - 1, len(herb_id_dct)))
+    symptom_matrix = sparse.csr_matrix((np.ones(len(symptom_ids),
+        dtype=np.int64), symptom_ids, symptom_indptr), shape=(len(
+        symptom_indptr) - 1, len(symptom_id_dct)))
+    co_occurrence_matrix = (herb_matrix.T.tocsr() * symptom_matrix).tocoo()
+    herb_counts = np.asarray(herb_matrix.sum(axis=0)).ravel()
+    symptom_counts = np.asarray(symptom_matrix.sum(axis=0)).ravel()
+    n = symptom_counts.sum() + herb_counts.sum()
+
+    # Compute the PMI of every co-occurring pair with a frequent symptom.
+    herbs, symptoms = co_occurrence_matrix.row, co_occurrence_matrix.col
+    frequent = symptom_counts[symptoms] >= MIN_SYMPTOM_COUNT
+    herbs, symptoms = herbs[frequent], symptoms[frequent]
+    pmi_scores = np.log(co_occurrence_matrix.data[frequent] * n / (
+        herb_counts[herbs] * symptom_counts[symptoms]).astype(np.float64))
+    top_dct = get_top_pairs(herbs, pmi_scores, NUM_SYMPTOMS_PER_HERB)
+
+    herb_list = sorted(herb_id_dct, key=herb_id_dct.get)
+    symptom_list = sorted(symptom_id_dct, key=symptom_id_dct.get)
+    # Get the top symptoms for every herb, most frequent herbs first.
     out = open('./results/frequent_herbs_and_symptoms.txt', 'w')
     out.write('herb\tsymptoms\n')
+    for herb in np.argsort(-herb_counts, kind='mergesort').tolist():
+        # out.write(herb + ',' + str(herb_count) + '\t')
+        out.write(herb_list[herb] + '\t')
+        for i in top_dct.get(herb, []):
+            out.write(symptom_list[symptoms[i]] + ',' + str(pmi_scores[
+                i].tolist()) + '\t')
+        out.write('\n\n')
+    out.close()
+
+def get_batch_pairs(herb_ids, herb_indptr, symptom_ids, symptom_indptr,
+    num_herbs, num_symptoms):
+    '''
+    Returns the (herb ids, symptom ids, co-occurrence counts) of the visits
+    whose herbs and symptoms are given in compressed sparse rows, from the
+    same sparse product as get_frequent_herbs.
+    '''
+    herb_matrix = sparse.csr_matrix((np.ones(len(herb_ids), dtype=np.int64),
+        herb_ids, herb_indptr), shape=(len(herb_indptr) - 1, num_herbs))
+    symptom_matrix = sparse.csr_matrix((np.ones(len(symptom_ids),
+        dtype=np.int64), symptom_ids, symptom_indptr), shape=(len(
+        symptom_indptr) - 1, num_symptoms))
+    pairs = (herb_matrix.T.tocsr() * symptom_matrix).tocoo()
+    return pairs.row, pairs.col, pairs.data
+
+def iter_visit_pairs(patient_dct, herb_id_dct, symptom_id_dct,
+    visits_per_batch=VISITS_PER_BATCH):
+    '''
+    Yields the (herb ids, symptom ids, weights) batch of the pairs of every
+    visits_per_batch visits. As in get_frequent_herbs, a pair's weight in a
+    visit is the number of times the herb appears times the number of times
+    the symptom appears, and the weights are summed over the batch.
+    '''
+    herb_ids, symptom_ids = [], []
+    herb_indptr, symptom_indptr = [0], [0]
+    for key in patient_dct:
+        for diseases, diagnosis_date, symptoms, herbs in patient_dct[key]:
+            herb_ids += [herb_id_dct.setdefault(herb, len(herb_id_dct)) for (
+                herb) in herbs]
+            symptom_ids += [symptom_id_dct.setdefault(symptom, len(
+                symptom_id_dct)) for symptom in symptoms]
+            herb_indptr += [len(herb_ids)]
+            symptom_indptr += [len(symptom_ids)]
+            if len(herb_indptr) > visits_per_batch:
+                yield get_batch_pairs(herb_ids, herb_indptr, symptom_ids,
+                    symptom_indptr, len(herb_id_dct), len(symptom_id_dct))
+                herb_ids, symptom_ids = [], []
+                herb_indptr, symptom_indptr = [0], [0]
+    if len(herb_indptr) > 1:
+        yield get_batch_pairs(herb_ids, herb_indptr, symptom_ids,
+            symptom_indptr, len(herb_id_dct), len(symptom_id_dct))
+
+def get_approximate_frequent_herbs(patient_dct, capacity, verify):
+    '''
+    Writes the same herbs and symptoms as get_frequent_herbs, from the pairs
+    kept by a pair sketch, with the lower and upper bounds of their counts.
+    PMI is computed from the lower bounds, since the upper bounds of rare
+    pairs are inflated by the sketch's error. If verify is True, the kept
+    pairs are counted exactly in a second pass, and PMI is computed and the
+    symptoms are ranked from the exact counts. Either way, a symptom list only
+    holds the pairs that the sketch kept, and once the sketch is full, pairs
+    with counts up to its smallest count may be missing. The output header
+    says so.
+    '''
+    herb_count_dct, symptom_count_dct = Counter(), Counter()
+    for key in patient_dct:
+        for diseases, diagnosis_date, symptoms, herbs in patient_dct[key]:
+            herb_count_dct.update(herbs)
+            symptom_count_dct.update(symptoms)
+    n = sum(symptom_count_dct.values()) + sum(herb_count_dct.values())
+
+    herb_id_dct, symptom_id_dct = {}, {}
+    sketch = sketch_pairs(iter_visit_pairs(patient_dct, herb_id_dct,
+        symptom_id_dct), capacity)
+    herb_ids, symptom_ids, estimates, lower_bounds = sketch.get_top(capacity)
+    space_saving_error, count_min_error = sketch.get_error_bounds()
+    print 'Space-Saving counts are at most %g too high' % space_saving_error
+    print 'Count-Min counts are at most %g too high with probability %g' % (
+        count_min_error, 1 - sketch.count_min.delta)
+    if space_saving_error > 0:
+        print ('Warning: pairs with counts up to %d may be missing from the '
+            'symptom lists. Use a larger capacity.' % space_saving_error)
+    if verify:
+        # Both bounds become the exact counts.
+        estimates = count_pairs_exactly(iter_visit_pairs(patient_dct,
+            herb_id_dct, symptom_id_dct), herb_ids, symptom_ids)
+        lower_bounds = estimates
+
+    herb_list = sorted(herb_id_dct, key=herb_id_dct.get)
+    symptom_list = sorted(symptom_id_dct, key=symptom_id_dct.get)
+    # Keys are herbs, values are (symptom, estimate, lower bound) triples.
+    herb_symptom_dct = {}
+    for herb_id, symptom_id, estimate, lower_bound in zip(herb_ids.tolist(),
+        symptom_ids.tolist(), estimates.tolist(), lower_bounds.tolist()):
+        herb_symptom_dct.setdefault(herb_list[herb_id], []).append((
+            symptom_list[symptom_id], estimate, lower_bound))
+
+    frequent_herbs = sorted(herb_count_dct.items(), key=operator.itemgetter(1),
+        reverse=True)
+    out = open('./results/frequent_herbs_and_symptoms_approx.txt', 'w')
+    if space_saving_error > 0:
+        out.write('# Symptom lists only hold the %d pairs kept by the '
+            'sketch, and may miss pairs with counts up to %d.\n' % (capacity,
+            space_saving_error))
+    out.write('herb\tsymptoms,pmi,count_lower_bound,count_upper_bound\n')
     for herb, herb_count in frequent_herbs:
-        # Keys are symptoms.
-        co_occurrence_dct = Counter(herb_symptom_dct[herb])
         pmi_dct = {}
-        for symptom in co_occurrence_dct:
-            co_occurrence_count = co_occurrence_dct[symptom]
+        for symptom, estimate, lower_bound in herb_symptom_dct.get(herb, []):
             symptom_count = symptom_count_dct[symptom]
-            if symptom_count < 10:
+            if symptom_count < MIN_SYMPTOM_COUNT:
                 continue
-            pmi_dct[symptom] = math.log(co_occurrence_count * n / 
-                float(herb_count * symptom_count), math.e)
+            pmi_dct[symptom] = (math.log(lower_bound * n / float(herb_count *
+                symptom_count), math.e), lower_bound, estimate)
 
-        frequent_symptoms = sorted(pmi_dct.items(),
-            key=operator.itemgetter(1), reverse=True)[:100]
-        # out.write(herb + ',' + str(herb_count) + '\t')
+        frequent_symptoms = sorted(pmi_dct.items(), key=lambda item: item[1][0],
+            reverse=True)[:NUM_SYMPTOMS_PER_HERB]
         out.write(herb + '\t')
-        for symptom, pmi in frequent_symptoms:
-            # out.write(symptom + ',' + str(co_occurrence_dct[symptom]) + ',' + str(symptom_count_dct[symptom]) + ',' + str(pmi) + '\t')
-            out.write(symptom + ',' + str(pmi) + '\t')
+        for symptom, (pmi, lower_bound, estimate) in frequent_symptoms:
+            out.write('%s,%s,%d,%d\t' % (symptom, pmi, lower_bound, estimate))
         out.write('\n\n')
     out.close()
-    
+
 def main():
+    if len(sys.argv) not in [1, 3, 4] or (len(sys.argv) > 1 and
+        sys.argv[1] != 'approx'):
+        print 'Usage: %s [approx capacity [verify]]' % sys.argv[0]
+        exit()
     patient_dct = file_operations.get_patient_dct()
-    frequent_herbs = get_frequent_herbs(patient_dct)
+    if len(sys.argv) > 1:
+        get_approximate_frequent_herbs(patient_dct, int(sys.argv[2]),
+            sys.argv[3:] == ['verify'])
+    else:
+        frequent_herbs = get_frequent_herbs(patient_dct)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,87 @@
+### Author: Edward Huang
+
+from collections import OrderedDict
+
+### This module holds the shared vocabulary for the ZRS pipeline. The
+### vocabulary maps every normalized symptom and drug to an integer id, along
+### with its type and the number of visits it appears in. normalize_ZRS_data.py
+### writes the vocabulary and the integer-encoded transactions once, and every
+### later stage loads them instead of re-tokenizing the Chinese strings.
+
+VOCAB_FNAME = './data/ZRS_vocabulary.txt'
+TRANSACTION_FNAME = './data/ZRS_transactions.txt'
+
+def build_vocabulary(symptom_dct, drug_dct):
+    '''
+    Takes the normalized symptom and drug dictionaries (keys are visit numbers,
+    values are lists of terms) and returns a list of (term, type, document
+    frequency) triples. A term's id is its index in the list.
+    '''
+    df_dct = OrderedDict({})
+    for term_type, visit_dct in [('symptom', symptom_dct), ('drug', drug_dct)]:
+        for visit_no in visit_dct:
+            for term in set(visit_dct[visit_no]):
+                if term not in df_dct:
+                    df_dct[term] = [term_type, 0]
+                # A term that is both a symptom and a drug is tagged as a drug,
+                # the same way mine_ZRS_frequent_patterns.py used to tag it.
+                if term_type == 'drug':
+                    df_dct[term][0] = term_type
+                df_dct[term][1] += 1
+    return [(term, df_dct[term][0], df_dct[term][1]) for term in df_dct]
+
+def write_vocabulary(vocabulary, fname=VOCAB_FNAME):
+    out = open(fname, 'w')
+    for term_id, (term, term_type, df) in enumerate(vocabulary):
+        out.write('%d\t%s\t%s\t%d\n' % (term_id, term, term_type, df))
+    out.close()
+
+def read_vocabulary(fname=VOCAB_FNAME):
+    '''
+    Returns the vocabulary as a list of (term, type, document frequency)
+    triples indexed by term id, and a dictionary mapping terms to ids.
+    '''
+    vocabulary = []
+    term_to_id = {}
+    f = open(fname, 'r')
+    for line in f:
+        term_id, term, term_type, df = line.rstrip('\n').split('\t')
+        assert int(term_id) == len(vocabulary)
+        term_to_id[term] = len(vocabulary)
+        vocabulary += [(term, term_type, int(df))]
+    f.close()
+    return vocabulary, term_to_id
+
+def write_transactions(symptom_dct, drug_dct, term_to_id,
+    fname=TRANSACTION_FNAME):
+    '''
+    Writes one line per visit: the visit number, the symptom ids, and the drug
+    ids, separated by tabs. Ids are comma-separated. Visits are written in the
+    order they first appear in the symptom file, then the drug file.
+    '''
+    visit_nos = OrderedDict({})
+    for visit_no in symptom_dct.keys() + drug_dct.keys():
+        visit_nos[visit_no] = True
+    out = open(fname, 'w')
+    for visit_no in visit_nos:
+        symptoms = [str(term_to_id[term]) for term in symptom_dct.get(
+            visit_no, [])]
+        drugs = [str(term_to_id[term]) for term in drug_dct.get(visit_no, [])]
+        out.write('%s\t%s\t%s\n' % (visit_no, ','.join(symptoms),
+            ','.join(drugs)))
+    out.close()
+
+def read_transactions(fname=TRANSACTION_FNAME):
+    '''
+    Returns a list of (visit number, symptom ids, drug ids) triples.
+    '''
+    transactions = []
+    f = open(fname, 'r')
+    for line in f:
+        visit_no, symptoms, drugs = line.rstrip('\n').split('\t')
+        symptoms = [int(term_id) for term_id in symptoms.split(',') if (
+            term_id != '')]
+        drugs = [int(term_id) for term_id in drugs.split(',') if term_id != '']
+        transactions += [(visit_no, symptoms, drugs)]
+    f.close()
+    return transactions